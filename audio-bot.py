@@ -1,7 +1,7 @@
-from time import sleep
-
 import urllib3
 import requests
+import functools
+import threading
 import json
 import sys
 import os
@@ -9,45 +9,291 @@ import argparse
 import logging
 
 from uuid import uuid1
-from socketIO_client import SocketIO, BaseNamespace
-from openvidu import Session, Server, OpenViduException
+from collections import deque
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor
+from socketIO_client import BaseNamespace
+from openvidu import Server, ServerPool, OpenViduException, Token, TokenCache
+from openvidu.scheduler import RecordingScheduler
+from openvidu.teardown import teardown_session
+from bot.transport import SlurkTransport
+from bot.delivery import AttributeBatcher
+from bot.dispatch import EventQueue, EventDispatcher, LANE_ROOM, LANE_JOIN, LANE_LEAVE
+from bot.health import HealthSampler
+from bot.lease import Lease, LeaderElector
+from bot.profiling import Profiler
 
 logger = logging.getLogger('audio-bot')
+profiler = Profiler()
 
 URI = None
 TOKEN = None
 TASK_ID = None
-OPENVIDU_URL = None
-OPENVIDU_SECRET = None
+OPENVIDU_URLS = None
+OPENVIDU_SECRETS = None
 OPENVIDU_VERIFY = True
+TOKEN_TTL = 300
+OPENVIDU_RATE_LIMIT = None
+OPENVIDU_CONCURRENCY = None
+TOKEN_DELIVERY_WINDOW = 1.0
+RECORDING_DELAY = 10
+RECORDING_CONCURRENCY = 4
+RECORDING_MAX_WAIT = 30
+RECORDING_OUTPUT_MODE = 'COMPOSED'
+TEARDOWN_DEADLINE = 10
+TEARDOWN_WORKERS = 16
+HEALTH_INTERVAL = 5
+PUBLISHER_TIMEOUT = 30
+EVENT_QUEUE_SIZE = 1000
+EVENT_WORKERS = 4
+LEASE_PATH = None
+LEASE_TTL = 5
+SESSION_PREFIX = ''
+VIDEO_MAX_BANDWIDTH = 1
+
+
+def audio_token_options():
+    # Kurento options of the audio-only tokens of the task, the same for every token so cached tokens stay valid.
+    # OpenVidu 2.x only limits video per token, the Opus bitrate of audio streams cannot be limited this way. The limit
+    # only bounds a camera stream published by accident, 1 Kbps by default, as OpenVidu treats 0 as unconstrained.
+    return {
+        'video_max_send_bandwidth': VIDEO_MAX_BANDWIDTH,
+        'video_max_recv_bandwidth': VIDEO_MAX_BANDWIDTH,
+        'allowed_filters': [],
+    }
+
+
+class BotState:
+    """
+    State of the bot which outlives a single connection to the chat server.
+    """
+    def __init__(self):
+        self.id = None
+        self.namespace = None
+        self.server = ServerPool(list(zip(OPENVIDU_URLS, OPENVIDU_SECRETS)), verify=OPENVIDU_VERIFY,
+                                 rate_limit=OPENVIDU_RATE_LIMIT, default_concurrency=OPENVIDU_CONCURRENCY)
+        self.sessions = {}
+        self.token_cache = TokenCache(ttl=TOKEN_TTL)
+        self.delivery = AttributeBatcher(self.emit, window=TOKEN_DELIVERY_WINDOW,
+                                         on_delivered=self.on_tokens_delivered,
+                                         on_failure=self.on_token_delivery_failed)
+        self.teardown = ThreadPoolExecutor(max_workers=TEARDOWN_WORKERS)
+        self.health = HealthSampler(self.server, self.session_ids, interval=HEALTH_INTERVAL,
+                                    publisher_timeout=PUBLISHER_TIMEOUT, on_anomaly=self.on_room_anomaly,
+                                    prefix=SESSION_PREFIX)
+        self.recordings = RecordingScheduler(max_composed=RECORDING_CONCURRENCY, max_wait=RECORDING_MAX_WAIT,
+                                             on_started=self.on_recording_started,
+                                             on_failure=self.on_recording_failed)
+        # socketIO_client allocates acknowledgement ids without locking, while several threads emit
+        self.emit_lock = threading.Lock()
+        self.events = EventQueue(maxsize=EVENT_QUEUE_SIZE)
+        self.dispatcher = EventDispatcher(self.events, workers=EVENT_WORKERS)
+
+        # Without a lease, this is the only instance. Otherwise, events are ignored until the instance became leader
+        # and restored the rooms.
+        self.active = LEASE_PATH is None
+        self.connected = threading.Event()
+        self.leader = None
+        # rooms created while not leading, which the previous leader might have missed before failing
+        self.recent_rooms = deque()
+        self.recent_rooms_lock = threading.Lock()
+        if LEASE_PATH is not None:
+            self.leader = LeaderElector(Lease(LEASE_PATH, ttl=LEASE_TTL),
+                                        on_elected=self.on_elected, on_demoted=self.on_demoted)
+
+    @property
+    def is_leader(self):
+        return self.active and (self.leader is None or self.leader.is_leader)
+
+    def on_elected(self, term):
+        threading.Thread(target=self.restore, name='restore', daemon=True).start()
+
+    def remember_room(self, data):
+        now = monotonic()
+        with self.recent_rooms_lock:
+            self.recent_rooms.append((now, data))
+            # the previous leader failed at most one lease ttl before this instance took over
+            while self.recent_rooms and self.recent_rooms[0][0] < now - 2 * LEASE_TTL:
+                self.recent_rooms.popleft()
+
+    def on_demoted(self):
+        # Another instance took over the rooms and the state of this one is stale, so it is restarted as standby
+        logger.error("Lost the leadership, exiting")
+        os._exit(4)
+
+    def restore(self):
+        """
+        Rebuilds the rooms from the sessions on the openvidu servers after taking over from another instance. Users who
+        are connected keep their tokens and running recordings are adopted, so neither is created twice. Only sessions
+        starting with the session prefix of the task are restored. Rooms created shortly before the takeover, which the
+        previous leader may have missed, are created afterwards unless they were restored.
+        """
+        self.connected.wait()
+        try:
+            self.server.refresh_load()
+            started = {}
+            for session in self.server.get_sessions(prefix=SESSION_PREFIX):
+                recordings = []
+                if session.recording:
+                    if session.server.url not in started:
+                        started[session.server.url] = session.server.get_recordings(status='started')
+                    recordings = [recording for recording in started[session.server.url]
+                                  if recording.session_id == session.id]
+                for recording in recordings:
+                    self.recordings.adopt(session, recording)
+
+                tokens = {}
+                for connection in session.connections:
+                    if connection.server_data and connection.server_data.isdigit():
+                        tokens[int(connection.server_data)] = Token({
+                            'id': connection.token,
+                            'session': session.id,
+                            'role': connection.role,
+                            'data': connection.server_data,
+                        })
+
+                self.sessions[session.id[len(SESSION_PREFIX):]] = {
+                    'id': session,
+                    'tokens': tokens,
+                    'recording': session.recording,
+                    'recordings': recordings,
+                }
+        except (OpenViduException, requests.RequestException) as e:
+            logger.error("Could not restore rooms: %s", e)
+            self.leader.lease.release()
+            os._exit(4)
+
+        logger.info("Restored %d rooms", len(self.sessions))
+        self.active = True
+        if HEALTH_INTERVAL > 0:
+            self.health.start()
+        self.namespace.on_reconnect()
+        for room, session in list(self.sessions.items()):
+            if session['tokens']:
+                self.namespace.schedule_recording(room)
+
+        with self.recent_rooms_lock:
+            missed = [data for _, data in self.recent_rooms]
+            self.recent_rooms.clear()
+        for data in missed:
+            self.enqueue(data['room'], LANE_ROOM, 'handle_new_task_room', data)
+
+    def session_ids(self):
+        return [session['id'].id for session in list(self.sessions.values())]
+
+    @staticmethod
+    def on_room_anomaly(session_id, anomalies):
+        logger.warning("Room %s is degraded: %s", session_id, ", ".join(anomalies))
+
+    def emit(self, *args):
+        self.namespace.emit(*args)
+
+    def handle(self, handler, data):
+        # the leadership may have been lost while the event was queued
+        if not self.is_leader:
+            logger.debug("Dropping %s, not leading", handler)
+            return
+        # resolved when the event is handled, as the namespace is replaced on reconnects
+        getattr(self.namespace, handler)(data)
+
+    def enqueue(self, room, lane, handler, data, user=None):
+        if not self.is_leader:
+            return
+        self.events.put(room, lane, functools.partial(self.handle, handler), data, user)
+
+    def on_tokens_delivered(self, room, receivers):
+        self.namespace.on_tokens_delivered(room, receivers)
+
+    def on_token_delivery_failed(self, room, receiver_id, data):
+        self.namespace.on_token_delivery_failed(room, receiver_id, data)
+
+    def session_of(self, session_id):
+        for session in list(self.sessions.values()):
+            if session['id'].id == session_id:
+                return session
+        return None
+
+    def on_recording_started(self, session, recording):
+        logger.info("%s recording of session %s started", recording.output_mode, session.id)
+        registered = self.session_of(session.id)
+        if registered:
+            registered['recordings'].append(recording)
+
+    def on_recording_failed(self, session, error):
+        registered = self.session_of(session.id)
+        if registered:
+            registered['recording'] = False
+
 
 class ChatNamespace(BaseNamespace):
-    def __init__(self, io, path):
+    def __init__(self, io, path, state=None):
         super().__init__(io, path)
 
-        self.id = None
-        self.server = Server(OPENVIDU_URL, OPENVIDU_SECRET, verify=OPENVIDU_VERIFY)
-        self.sessions = {}
+        self.state = state if state is not None else BotState()
+        self.state.namespace = self
+        self.server = self.state.server
+        self.sessions = self.state.sessions
+        self.token_cache = self.state.token_cache
         self.emit('ready')
+        self.state.connected.set()
+
+    def emit(self, event, *args, **kw):
+        with self.state.emit_lock:
+            super().emit(event, *args, **kw)
+
+    @property
+    def id(self):
+        return self.state.id
+
+    @id.setter
+    def id(self, value):
+        self.state.id = value
+
+    def on_reconnect(self):
+        # workers add and remove rooms concurrently
+        for room in list(self.sessions):
+            self.emit("join_room", {'user': self.id, 'room': room})
 
     def on_new_task_room(self, data):
         if data['task'] == TASK_ID:
+            if not self.state.is_leader:
+                self.state.remember_room(data)
+            self.state.enqueue(data['room'], LANE_ROOM, 'handle_new_task_room', data)
+
+    @profiler.timed('on_new_task_room')
+    def handle_new_task_room(self, data):
+        if data['room'] not in self.sessions:
             self.sessions[data['room']] = {
-                'id': self.server.initialize_session(custom_session_id=data['room']),
-                'tokens': dict()
+                'id': self.server.initialize_session(custom_session_id=SESSION_PREFIX + data['room']),
+                'tokens': dict(),
+                'recording': False,
+                'recordings': [],
             }
             self.emit("join_room", {'user': self.id, 'room': data['room']})
 
     def on_joined_room(self, data):
         self.id = data['user']
         print(self.id)
+        self.state.enqueue(data['room'], LANE_JOIN, 'handle_joined_room', data)
+
+    @profiler.timed('on_joined_room')
+    def handle_joined_room(self, data):
         resp = requests.get(f"{URI}/room/{data['room']}", headers={'Authorization': f"Token {TOKEN}"})
         if resp.status_code == 200:
             room = json.loads(resp.content)
+            session = self.sessions.get(data['room'], {})
             for id in room['current_users'].keys():
-                self.send_token_to_client(data['room'], int(id))
+                # Users holding a token received it before a reconnect, or from the previous leader
+                if int(id) not in session.get('tokens', {}):
+                    self.send_token_to_client(data['room'], int(id))
 
     def on_status(self, data):
+        lane = {'join': LANE_JOIN, 'leave': LANE_LEAVE}.get(data['type'])
+        if lane is not None:
+            self.state.enqueue(data['room'], lane, 'handle_status', data, int(data['user']['id']))
+
+    @profiler.timed('on_status')
+    def handle_status(self, data):
         room = data['room']
         user_id = int(data['user']['id'])
         if data['type'] == 'join':
@@ -56,18 +302,45 @@ class ChatNamespace(BaseNamespace):
             session = self.sessions.get(room)
             if not session:
                 return
-            del session['tokens']['user_id']
+            session['tokens'].pop(user_id, None)
+            # The user may have connected with the token, so it must not be handed out again
+            self.token_cache.invalidate(session['id'].id, user_id)
+            self.state.delivery.cancel(room, user_id)
             if len(session['tokens']) == 0:
-                session['id'].close()
+                session_id = session['id'].id
+                self.state.recordings.cancel(session_id)
+                teardown = self.state.teardown.submit(teardown_session, session['id'], TEARDOWN_DEADLINE,
+                                                      session['recordings'])
+                teardown.add_done_callback(lambda _: self.state.recordings.release(session_id))
+                self.server.release(session['id'].id)
+                self.token_cache.invalidate(session['id'].id)
                 del self.sessions[room]
 
     @staticmethod
-    def update_client_token_response(success, data=None):
-        if not success:
-            logger.error("Could not update client token:", data)
-            sys.exit(3)
-        logger.info("token sent to client")
+    def on_token_delivery_failed(room, receiver_id, data):
+        logger.error("Could not update client token of user %s in room %s: %s", receiver_id, room, data)
+        sys.exit(3)
+
+    def on_tokens_delivered(self, room, receivers):
+        logger.info("token sent to clients %s", sorted(receivers))
+        self.schedule_recording(room)
 
+    def schedule_recording(self, room):
+        session = self.sessions.get(room)
+        if not session or session['recording']:
+            return
+        session['recording'] = True
+        timer = threading.Timer(RECORDING_DELAY, self.start_recording, args=(room,))
+        timer.daemon = True
+        timer.start()
+
+    def start_recording(self, room):
+        session = self.sessions.get(room)
+        if not session:
+            return
+        self.state.recordings.schedule(session['id'], output_mode=RECORDING_OUTPUT_MODE, has_video=False)
+
+    @profiler.timed('send_token_to_client')
     def send_token_to_client(self, room, user_id):
         if user_id == self.id:
             return
@@ -76,15 +349,10 @@ class ChatNamespace(BaseNamespace):
         if not session:
             return
 
-        session['tokens']['user_id'] = session['id'].generate_token()
-
-        sleep(1)
-        self.emit("set_attribute", {"attribute": "value", "value": session['tokens']['user_id'].id, "id": "openvidu-token", 'receiver_id': user_id, 'room': room}, self.update_client_token_response)
-        sleep(10)
-        try:
-            session['id'].start_recording(has_video=False)
-        except OpenViduException as e:
-            logger.error(e)
+        # the user id is stored in the recordings, see openvidu.analytics
+        session['tokens'][user_id] = self.token_cache.get(session['id'], user_id, data=str(user_id),
+                                                          **audio_token_options())
+        self.state.delivery.set_attribute(room, user_id, "openvidu-token", "value", session['tokens'][user_id].id)
 
 
 def str2bool(v):
@@ -151,6 +419,71 @@ if __name__ == '__main__':
     else:
         openvidu_verify = {'default': True}
 
+    if 'OPENVIDU_RATE_LIMIT' in os.environ:
+        openvidu_rate_limit = {'default': os.environ['OPENVIDU_RATE_LIMIT']}
+    else:
+        openvidu_rate_limit = {'default': None}
+
+    if 'OPENVIDU_CONCURRENCY' in os.environ:
+        openvidu_concurrency = {'default': os.environ['OPENVIDU_CONCURRENCY']}
+    else:
+        openvidu_concurrency = {'default': None}
+
+    if 'HEALTH_INTERVAL' in os.environ:
+        health_interval = {'default': os.environ['HEALTH_INTERVAL']}
+    else:
+        health_interval = {'default': 5}
+
+    if 'PROFILE_DIR' in os.environ:
+        profile_dir = {'default': os.environ['PROFILE_DIR']}
+    else:
+        profile_dir = {'default': '.'}
+
+    if 'RECORDING_CONCURRENCY' in os.environ:
+        recording_concurrency = {'default': os.environ['RECORDING_CONCURRENCY']}
+    else:
+        recording_concurrency = {'default': 4}
+
+    if 'RECORDING_MAX_WAIT' in os.environ:
+        recording_max_wait = {'default': os.environ['RECORDING_MAX_WAIT']}
+    else:
+        recording_max_wait = {'default': 30}
+
+    if 'RECORDING_OUTPUT_MODE' in os.environ:
+        recording_output_mode = {'default': os.environ['RECORDING_OUTPUT_MODE']}
+    else:
+        recording_output_mode = {'default': 'COMPOSED'}
+
+    if 'EVENT_QUEUE_SIZE' in os.environ:
+        event_queue_size = {'default': os.environ['EVENT_QUEUE_SIZE']}
+    else:
+        event_queue_size = {'default': 1000}
+
+    if 'LEASE_PATH' in os.environ:
+        lease_path = {'default': os.environ['LEASE_PATH']}
+    else:
+        lease_path = {'default': None}
+
+    if 'LEASE_TTL' in os.environ:
+        lease_ttl = {'default': os.environ['LEASE_TTL']}
+    else:
+        lease_ttl = {'default': 5}
+
+    if 'SESSION_PREFIX' in os.environ:
+        session_prefix = {'default': os.environ['SESSION_PREFIX']}
+    else:
+        session_prefix = {'default': None}
+
+    if 'TOKEN_TTL' in os.environ:
+        token_ttl = {'default': os.environ['TOKEN_TTL']}
+    else:
+        token_ttl = {'default': 300}
+
+    if 'VIDEO_MAX_BANDWIDTH' in os.environ:
+        video_max_bandwidth = {'default': os.environ['VIDEO_MAX_BANDWIDTH']}
+    else:
+        video_max_bandwidth = {'default': 1}
+
     parser.add_argument('-t', '--token',
                         help='token for logging in as bot (see SERVURL/token)',
                         **token)
@@ -167,22 +500,93 @@ if __name__ == '__main__':
                         **task_id)
     parser.add_argument('--openvidu-url',
                         type=str,
-                        help='URL for openvidu kms server',
+                        help='URL for openvidu kms server. Separate multiple servers by commas',
                         **openvidu_url)
     parser.add_argument('--openvidu-secret',
                         type=str,
-                        help='Secret for openvidu kms server',
+                        help='Secret for openvidu kms server. Separate multiple secrets by commas, or pass a single '
+                             'secret shared by all servers',
                         **openvidu_secret)
     parser.add_argument('--openvidu-verify',
                         type=str2bool,
                         help='Verify certificate for openvidu server',
                         **openvidu_verify)
+    parser.add_argument('--openvidu-rate-limit',
+                        type=float,
+                        help='Maximum number of API calls per second to each openvidu server',
+                        **openvidu_rate_limit)
+    parser.add_argument('--openvidu-concurrency',
+                        type=int,
+                        help='Maximum number of concurrent API calls per endpoint of each openvidu server',
+                        **openvidu_concurrency)
+    parser.add_argument('--health-interval',
+                        type=float,
+                        help='Seconds between health samples of the rooms, 0 to disable sampling',
+                        **health_interval)
+    parser.add_argument('--profile-dir',
+                        type=str,
+                        help='Directory for profiles, which are taken for 30 seconds after receiving SIGUSR1',
+                        **profile_dir)
+    parser.add_argument('--recording-concurrency',
+                        type=int,
+                        help='Maximum number of concurrent composed recordings per openvidu server',
+                        **recording_concurrency)
+    parser.add_argument('--recording-max-wait',
+                        type=float,
+                        help='Seconds a recording waits for a free slot before recording the streams individually',
+                        **recording_max_wait)
+    parser.add_argument('--recording-output-mode',
+                        choices=['COMPOSED', 'INDIVIDUAL'],
+                        help='Record a mix of all participants, or every participant individually, which is required '
+                             'for openvidu.analytics',
+                        **recording_output_mode)
+    parser.add_argument('--event-queue-size',
+                        type=int,
+                        help='Maximum number of chat events waiting to be handled before the socket is throttled',
+                        **event_queue_size)
+    parser.add_argument('--lease-path',
+                        type=str,
+                        help='SQLite file shared by several bot instances, of which only the leader handles events',
+                        **lease_path)
+    parser.add_argument('--lease-ttl',
+                        type=float,
+                        help='Seconds after which a standby instance takes over from an unresponsive leader',
+                        **lease_ttl)
+    parser.add_argument('--session-prefix',
+                        help='Prefix of the openvidu session ids of the rooms, which tells them apart from sessions of '
+                             'other tasks and applications on the same servers. Defaults to `task-<task id>-`',
+                        **session_prefix)
+    parser.add_argument('--token-ttl',
+                        type=float,
+                        help='Seconds an unused openvidu token is reused for reconnecting users',
+                        **token_ttl)
+    parser.add_argument('--video-max-bandwidth',
+                        type=int,
+                        help='Kbps of video a participant of the task may send and receive. Audio bitrate cannot be '
+                             'limited per token with OpenVidu 2.x',
+                        **video_max_bandwidth)
     args = parser.parse_args()
 
     TASK_ID = args.task_id
-    OPENVIDU_URL = args.openvidu_url
-    OPENVIDU_SECRET = args.openvidu_secret
+    OPENVIDU_URLS = args.openvidu_url.split(',')
+    OPENVIDU_SECRETS = args.openvidu_secret.split(',')
+    if len(OPENVIDU_SECRETS) == 1:
+        OPENVIDU_SECRETS *= len(OPENVIDU_URLS)
+    elif len(OPENVIDU_SECRETS) != len(OPENVIDU_URLS):
+        parser.error('--openvidu-secret requires a single secret or one secret per server')
     OPENVIDU_VERIFY = args.openvidu_verify
+    TOKEN_TTL = args.token_ttl
+    VIDEO_MAX_BANDWIDTH = args.video_max_bandwidth
+    HEALTH_INTERVAL = args.health_interval
+    OPENVIDU_RATE_LIMIT = args.openvidu_rate_limit
+    OPENVIDU_CONCURRENCY = args.openvidu_concurrency
+    EVENT_QUEUE_SIZE = args.event_queue_size
+    RECORDING_CONCURRENCY = args.recording_concurrency
+    RECORDING_MAX_WAIT = args.recording_max_wait
+    RECORDING_OUTPUT_MODE = args.recording_output_mode
+    LEASE_PATH = args.lease_path
+    LEASE_TTL = args.lease_ttl
+    SESSION_PREFIX = args.session_prefix if args.session_prefix is not None else f"task-{TASK_ID}-"
 
     URI = args.chat_host
     if args.chat_port:
@@ -192,8 +596,20 @@ if __name__ == '__main__':
     URI += "/api/v2"
     TOKEN = args.token
 
+    profiler.output_dir = args.profile_dir
+    profiler.instrument(Server, '_request',
+                        lambda server, method, path, endpoint, priority, **kwargs: f"openvidu {method} {endpoint}")
+    profiler.install_signal_handler()
+
+    state = BotState()
+
     # We pass token and name in request header
-    socketIO = SocketIO(args.chat_host, args.chat_port,
-                        headers={'Authorization': TOKEN, 'Name': 'Kamikaze'},
-                        Namespace=ChatNamespace)
-    socketIO.wait()
+    transport = SlurkTransport(args.chat_host, args.chat_port,
+                               headers={'Authorization': TOKEN, 'Name': 'Kamikaze'},
+                               namespace=functools.partial(ChatNamespace, state=state))
+    state.dispatcher.start()
+    if state.leader is not None:
+        state.leader.start()
+    elif HEALTH_INTERVAL > 0:
+        state.health.start()
+    transport.run()
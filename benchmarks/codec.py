@@ -0,0 +1,114 @@
+"""
+Microbenchmark of the JSON codecs on realistic OpenVidu payloads.
+
+Usage: python benchmarks/codec.py [--sessions N] [--connections N] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from openvidu import codec, _iter_json_array, _token_template, _recording_template  # noqa: E402
+
+
+def connection(session, index):
+    stream = 'str_MIC_{}_con_{}'.format(session, index)
+    return {
+        "connectionId": "con_{}_{}".format(session, index),
+        "createdAt": 1574952840000 + index,
+        "location": "unknown",
+        "platform": "Chrome 78.0.3904.108 on OS X 10.15.1",
+        "token": "wss://localhost:4443?sessionId={}&token=tok_{:016x}&role=PUBLISHER&version=2.11.0".format(
+            session, index),
+        "role": "PUBLISHER",
+        "serverData": "",
+        "clientData": "",
+        "publishers": [{
+            "createdAt": 1574952841000 + index,
+            "streamId": stream,
+            "mediaOptions": {
+                "hasAudio": True, "audioActive": True, "hasVideo": False, "videoActive": False,
+                "typeOfVideo": None, "frameRate": None, "videoDimensions": None, "filter": {},
+            },
+        }],
+        "subscribers": [{"streamId": "str_MIC_{}_con_{}".format(session, other), "publisher": "con_{}_{}".format(
+            session, other)} for other in range(3) if other != index],
+    }
+
+
+def sessions_payload(sessions, connections):
+    content = []
+    for index in range(sessions):
+        session = 'pilot-{:08x}'.format(index)
+        content.append({
+            "sessionId": session,
+            "createdAt": 1574952839000,
+            "mediaMode": "ROUTED",
+            "recordingMode": "MANUAL",
+            "defaultOutputMode": "COMPOSED",
+            "defaultRecordingLayout": "BEST_FIT",
+            "customSessionId": session,
+            "connections": {
+                "numberOfElements": connections,
+                "content": [connection(session, i) for i in range(connections)],
+            },
+            "recording": False,
+        })
+    return json.dumps({"numberOfElements": sessions, "content": content}).encode('utf-8')
+
+
+def bench(name, statement, repeat):
+    seconds = min(timeit.repeat(statement, number=1, repeat=repeat))
+    print('{:<40} {:>10.3f} ms'.format(name, seconds * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--connections', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    payload = sessions_payload(args.sessions, args.connections)
+    print('GET /api/sessions: {} sessions, {} connections each, {:.1f} KiB'.format(
+        args.sessions, args.connections, len(payload) / 1024))
+
+    for name, implementation in codec.CODECS.items():
+        bench('decode ({})'.format(name), lambda: implementation.loads(payload), args.repeat)
+
+    # Listings with a known length of up to 8 MiB are decoded whole by the selected codec, as measured above. Larger
+    # or chunked listings are streamed, which always decodes with the C accelerated decoder of the standard library.
+    chunks = [payload[i:i + 16 * 1024] for i in range(0, len(payload), 16 * 1024)]
+    bench('streaming decode (stdlib json)', lambda: sum(1 for _ in _iter_json_array(chunks, 'content')),
+          args.repeat)
+
+    print()
+    print('Request bodies, 10000 each:')
+    kurento = (('videoMaxSendBandwidth', 1), ('videoMaxRecvBandwidth', 30), ('allowedFilters', ()))
+    for name, implementation in codec.CODECS.items():
+        bench('token body, dict ({})'.format(name), lambda: [implementation.dumps({
+            "session": "pilot-0", "role": "PUBLISHER", "data": None,
+            "kurentoOptions": {"videoMaxSendBandwidth": 1, "videoMaxRecvBandwidth": 30, "allowedFilters": []},
+        }) for _ in range(10000)], args.repeat)
+        bench('recording body, dict ({})'.format(name), lambda: [implementation.dumps({
+            "session": "pilot-0", "name": None, "outputMode": "COMPOSED", "hasAudio": True, "hasVideo": False,
+            "recordingLayout": "BEST_FIT", "customLayout": None, "resolution": None,
+        }) for _ in range(10000)], args.repeat)
+    for name in codec.CODECS:
+        codec.set_codec(name)
+        _token_template.cache_clear()
+        _recording_template.cache_clear()
+        bench('token body, template ({})'.format(name), lambda: [
+            _token_template("PUBLISHER", kurento).render(session="pilot-0", data=None) for _ in range(10000)],
+            args.repeat)
+        bench('recording body, template ({})'.format(name), lambda: [
+            _recording_template("COMPOSED", True, False, "BEST_FIT", None, None).render(session="pilot-0", name=None)
+            for _ in range(10000)], args.repeat)
+
+
+if __name__ == '__main__':
+    main()
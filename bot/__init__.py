@@ -0,0 +1,3 @@
+"""
+Building blocks of the audio pilot bot.
+"""
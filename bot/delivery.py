@@ -0,0 +1,124 @@
+"""
+Batched delivery of attribute updates to clients.
+"""
+
+import functools
+import logging
+import threading
+from typing import Callable, Hashable, Iterable, Optional
+
+
+class AttributeBatcher:
+    """
+    Collects `set_attribute` updates per room over a short window and sends them back to back instead of one round-trip
+    per receiver. Acknowledgements are tracked per receiver and only failed updates are sent again.
+    """
+    def __init__(self, emit: Callable, window: float = 1.0, max_retries: int = 3,
+                 on_delivered: Callable[[Hashable, Iterable[int]], None] = None,
+                 on_failure: Callable[[Hashable, int, Optional[dict]], None] = None):
+        """
+        :param emit: Function emitting a socket event, called as `emit(event, data, callback)`
+        :param float window: Number of seconds updates for a room are collected before they are sent
+        :param int max_retries: Number of times a failed update is sent again
+        :param on_delivered: Called with the room and the receivers once all updates of a batch are acknowledged
+        :param on_failure: Called with the room, the receiver and the error once an update failed `max_retries` times
+        """
+        self.emit = emit
+        self.window = window
+        self.max_retries = max_retries
+        self.on_delivered = on_delivered
+        self.on_failure = on_failure
+
+        self._pending = {}
+        self._timers = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the AttributeBatcher class.
+        """
+        return logging.getLogger('bot.AttributeBatcher')
+
+    def set_attribute(self, room: Hashable, receiver_id: int, element_id: str, attribute: str, value):
+        """
+        Schedules an attribute update for a receiver. A pending update of the same element for the same receiver is
+        replaced.
+
+        :param room: The room of the receiver
+        :param int receiver_id: The user receiving the update
+        :param str element_id: Id of the element to update
+        :param str attribute: The attribute to set
+        :param value: The new value
+        """
+        update = {"attribute": attribute, "value": value, "id": element_id, "receiver_id": receiver_id, "room": room}
+        with self._lock:
+            self._pending.setdefault(room, {})[(receiver_id, element_id)] = (update, 0)
+            if room not in self._timers:
+                timer = threading.Timer(self.window, self.flush, args=(room,))
+                timer.daemon = True
+                self._timers[room] = timer
+                timer.start()
+
+    def cancel(self, room: Hashable, receiver_id: int = None):
+        """
+        Drops pending updates of a room, or of a single receiver in the room.
+
+        :param room: The room
+        :param int receiver_id: The receiver, or `None` for all receivers
+        """
+        with self._lock:
+            pending = self._pending.get(room, {})
+            for key in [key for key in pending if receiver_id is None or key[0] == receiver_id]:
+                del pending[key]
+
+    def flush(self, room: Hashable):
+        """
+        Sends all pending updates of a room immediately.
+
+        :param room: The room
+        """
+        with self._lock:
+            timer = self._timers.pop(room, None)
+            if timer is not None:
+                timer.cancel()
+            batch = self._pending.pop(room, {})
+            if not batch:
+                return
+            in_flight, _ = self._in_flight.setdefault(room, (set(), set()))
+            in_flight.update(batch)
+
+        self.logger.debug('Sending %d attribute updates to room `%s`', len(batch), room)
+        for key, (update, attempt) in batch.items():
+            self.emit("set_attribute", update, functools.partial(self._acknowledge, room, key, update, attempt))
+
+    def _acknowledge(self, room, key, update, attempt, success, data=None):
+        retry = not success and attempt < self.max_retries
+        delivered = None
+        with self._lock:
+            in_flight, receivers = self._in_flight.get(room, (set(), set()))
+            in_flight.discard(key)
+            if success:
+                receivers.add(update['receiver_id'])
+            elif retry:
+                self._pending.setdefault(room, {}).setdefault(key, (update, attempt + 1))
+            if not in_flight and not retry:
+                self._in_flight.pop(room, None)
+                delivered = receivers
+
+        if success:
+            self.logger.debug('Attribute `%s` of user %s updated', update['id'], update['receiver_id'])
+        elif retry:
+            self.logger.warning('Could not update attribute `%s` of user %s, retrying: %s', update['id'],
+                                update['receiver_id'], data)
+        else:
+            self.logger.error('Could not update attribute `%s` of user %s: %s', update['id'], update['receiver_id'],
+                              data)
+            if self.on_failure:
+                self.on_failure(room, update['receiver_id'], data)
+
+        if retry:
+            self.flush(room)
+        elif delivered and self.on_delivered:
+            self.on_delivered(room, delivered)
@@ -0,0 +1,264 @@
+"""
+Bounded, prioritized event queue between the socket and the bot's handlers.
+"""
+
+import itertools
+import logging
+import threading
+from collections import deque
+from time import monotonic
+from typing import Callable, Hashable, Optional
+
+LANE_ROOM = 0
+"""Creation of rooms."""
+
+LANE_JOIN = 1
+"""Users joining a room."""
+
+LANE_LEAVE = 2
+"""Users leaving a room."""
+
+LANES = (LANE_ROOM, LANE_JOIN, LANE_LEAVE)
+
+
+class Event:
+    """
+    An event waiting to be handled.
+    """
+    __slots__ = ('sequence', 'room', 'lane', 'handler', 'data', 'user', 'enqueued_at')
+
+    def __init__(self, sequence: int, room: Hashable, lane: int, handler: Callable, data, user: Hashable = None):
+        self.sequence = sequence
+        self.room = room
+        self.lane = lane
+        self.handler = handler
+        self.data = data
+        self.user = user
+        self.enqueued_at = monotonic()
+
+    def __repr__(self):
+        return str({
+            "room": self.room,
+            "lane": self.lane,
+            "handler": getattr(self.handler, '__name__', repr(self.handler)),
+            "user": self.user,
+        })
+
+
+class EventQueue:
+    """
+    Bounded queue of events with per-room ordering.
+
+    Events of the same room are handled one at a time and in arrival order. Across rooms, the room whose oldest event is
+    in the most important lane is served first: room creation before joins before leaves. A leave which arrives while
+    the join of the same user in the same room is still waiting cancels the join. The leave itself is only dropped as
+    well if no earlier join of the user in the room was handed out, as there is nothing to undo then. Producers block
+    while the queue is full.
+    """
+    def __init__(self, maxsize: int = 1000):
+        """
+        :param int maxsize: Maximum number of waiting events
+        """
+        self.maxsize = maxsize
+        self._rooms = {}
+        self._busy = set()
+        self._joined = {}
+        self._size = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        self.enqueued = {lane: 0 for lane in LANES}
+        self.handled = {lane: 0 for lane in LANES}
+        self.coalesced = 0
+        self.max_depth = 0
+        self.blocked_puts = 0
+        self.blocked_time = 0.0
+        self.total_wait = {lane: 0.0 for lane in LANES}
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the EventQueue class.
+        """
+        return logging.getLogger('bot.EventQueue')
+
+    @property
+    def metrics(self) -> dict:
+        """
+        Get a snapshot of the queue metrics.
+        """
+        with self._condition:
+            depth = {lane: 0 for lane in LANES}
+            for events in self._rooms.values():
+                for event in events:
+                    depth[event.lane] += 1
+            return {
+                "depth": depth,
+                "max_depth": self.max_depth,
+                "enqueued": dict(self.enqueued),
+                "handled": dict(self.handled),
+                "coalesced": self.coalesced,
+                "blocked_puts": self.blocked_puts,
+                "blocked_time": self.blocked_time,
+                "average_wait": {lane: self.total_wait[lane] / self.handled[lane] if self.handled[lane] else 0.0
+                                 for lane in LANES},
+            }
+
+    def put(self, room: Hashable, lane: int, handler: Callable, data, user: Hashable = None):
+        """
+        Enqueues an event, blocking while the queue is full.
+
+        :param room: The room the event belongs to
+        :param int lane: `LANE_ROOM`, `LANE_JOIN` or `LANE_LEAVE`
+        :param handler: Called with `data` to handle the event
+        :param data: The event payload
+        :param user: The user the event is about, used to coalesce joins and leaves
+        """
+        with self._condition:
+            self.enqueued[lane] += 1
+            if self._coalesce(room, lane, user):
+                return
+
+            if self._size >= self.maxsize:
+                self.blocked_puts += 1
+                self.logger.warning('Event queue is full (%d events), throttling the socket', self._size)
+                started_at = monotonic()
+                while self._size >= self.maxsize:
+                    self._condition.wait()
+                    if self._coalesce(room, lane, user):
+                        self.blocked_time += monotonic() - started_at
+                        return
+                self.blocked_time += monotonic() - started_at
+
+            events = self._rooms.setdefault(room, deque())
+            events.append(Event(next(self._sequence), room, lane, handler, data, user))
+            self._size += 1
+            self.max_depth = max(self.max_depth, self._size)
+            self._condition.notify_all()
+
+    def _coalesce(self, room: Hashable, lane: int, user: Hashable) -> bool:
+        # drops the waiting join of a leaving user, unless another event of the user follows it, and returns whether
+        # the leave can be dropped as well
+        if lane != LANE_LEAVE or user is None:
+            return False
+        events = self._rooms.get(room)
+        if not events:
+            return False
+        for pending in reversed(events):
+            if pending.user != user:
+                continue
+            if pending.lane != LANE_JOIN:
+                return False
+            events.remove(pending)
+            self._size -= 1
+            self.coalesced += 1
+            if not events and room not in self._busy:
+                del self._rooms[room]
+            self._condition.notify_all()
+            return user not in self._joined.get(room, ())
+        return False
+
+    def _next(self) -> Optional[Event]:
+        best = None
+        for room, events in self._rooms.items():
+            if room in self._busy or not events:
+                continue
+            head = events[0]
+            if best is None or (head.lane, head.sequence) < (best.lane, best.sequence):
+                best = head
+        return best
+
+    def get(self, timeout: float = None) -> Optional[Event]:
+        """
+        Removes the next event, blocking until one is available. The room of the event is not served again until
+        `done` is called for the event.
+
+        :param float timeout: Maximum number of seconds to wait
+        :return: The event, or `None` if the timeout expired
+        """
+        with self._condition:
+            event = self._next()
+            if event is None:
+                if not self._condition.wait_for(lambda: self._next() is not None, timeout):
+                    return None
+                event = self._next()
+            self._rooms[event.room].popleft()
+            self._busy.add(event.room)
+            if event.user is not None:
+                # users whose join was handed out, so their leave has to be handled
+                if event.lane == LANE_JOIN:
+                    self._joined.setdefault(event.room, set()).add(event.user)
+                elif event.lane == LANE_LEAVE:
+                    joined = self._joined.get(event.room)
+                    if joined is not None:
+                        joined.discard(event.user)
+                        if not joined:
+                            del self._joined[event.room]
+            self._size -= 1
+            self.total_wait[event.lane] += monotonic() - event.enqueued_at
+            self._condition.notify_all()
+            return event
+
+    def done(self, event: Event):
+        """
+        Marks an event returned by `get` as handled.
+        """
+        with self._condition:
+            self._busy.discard(event.room)
+            self.handled[event.lane] += 1
+            if not self._rooms.get(event.room, True):
+                del self._rooms[event.room]
+            self._condition.notify_all()
+
+
+class EventDispatcher:
+    """
+    Worker threads handling the events of an `EventQueue`.
+    """
+    def __init__(self, queue: EventQueue, workers: int = 4):
+        """
+        :param EventQueue queue: The queue to handle
+        :param int workers: Number of worker threads. Events of different rooms are handled concurrently.
+        """
+        self.queue = queue
+        self.workers = workers
+        self._stopped = threading.Event()
+        self._threads = []
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the EventDispatcher class.
+        """
+        return logging.getLogger('bot.EventDispatcher')
+
+    def _run(self):
+        while not self._stopped.is_set():
+            event = self.queue.get(timeout=1)
+            if event is None:
+                continue
+            try:
+                event.handler(event.data)
+            except Exception:
+                self.logger.exception('Could not handle event %s', event)
+            finally:
+                self.queue.done(event)
+
+    def start(self):
+        """
+        Starts the worker threads.
+        """
+        self._stopped.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name='dispatcher-{}'.format(index), daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        """
+        Stops the worker threads once they finished their current event.
+        """
+        self._stopped.set()
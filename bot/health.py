@@ -0,0 +1,243 @@
+"""
+Periodic health sampling of the OpenVidu sessions managed by the bot.
+"""
+
+import logging
+import math
+import threading
+from array import array
+from time import monotonic
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of numbers backed by an `array`. Appending overwrites the oldest value once the buffer is full,
+    so no memory is allocated after construction.
+    """
+    def __init__(self, capacity: int, typecode: str = 'd'):
+        """
+        :param int capacity: Maximum number of values kept
+        :param str typecode: Type code of the backing `array`
+        """
+        self.capacity = capacity
+        self._values = array(typecode, [0]) * capacity
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        """
+        Stores a value, overwriting the oldest one if the buffer is full.
+        """
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def values(self) -> List:
+        """
+        Get the stored values from oldest to newest.
+        """
+        if self._size < self.capacity:
+            return self._values[:self._size].tolist()
+        return (self._values[self._next:] + self._values[:self._next]).tolist()
+
+    def last(self):
+        """
+        Get the newest value, or `None` if the buffer is empty.
+        """
+        if not self._size:
+            return None
+        return self._values[self._next - 1]
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Get the percentile of the stored values using the nearest-rank method, or `None` if the buffer is empty.
+
+        :param float percent: Percentile between 0 and 100
+        """
+        if not self._size:
+            return None
+        values = sorted(self._values[:self._size])
+        rank = max(0, min(self._size - 1, math.ceil(percent / 100 * self._size) - 1))
+        return values[rank]
+
+
+class RoomHealth:
+    """
+    Time series of a single room.
+    """
+    def __init__(self, session_id: str, capacity: int):
+        """
+        :param str session_id: Id of the sampled session
+        :param int capacity: Number of samples kept per series
+        """
+        self.session_id = session_id
+        self.timestamps = RingBuffer(capacity)
+        self.connections = RingBuffer(capacity, 'l')
+        self.publishers = RingBuffer(capacity, 'l')
+        self.subscribers = RingBuffer(capacity, 'l')
+        self.recording = RingBuffer(capacity, 'b')
+        # Published and subscribed streams per connection id at the last sample
+        self.connection_streams = {}
+        # Connection id mapped to the time since which the connection does not publish any stream
+        self.silent_since = {}
+        self.recording_lost = False
+
+    def record(self, timestamp: float, connections: int, publishers: int, subscribers: int, recording: bool,
+               connection_streams: Dict[str, Tuple[int, int]] = None):
+        """
+        Stores a sample. A connection is considered silent from the first sample in which it publishes no stream until
+        it publishes again or leaves the session.
+
+        :param float timestamp: Time of the sample as returned by `time.monotonic`
+        :param int connections: Number of connections in the session
+        :param int publishers: Number of published streams
+        :param int subscribers: Number of subscribed streams
+        :param bool recording: Whether the session is being recorded
+        :param dict connection_streams: Number of published and subscribed streams per connection id
+        """
+        self.recording_lost = bool(self.recording.last()) and not recording and connections > 0
+        self.timestamps.append(timestamp)
+        self.connections.append(connections)
+        self.publishers.append(publishers)
+        self.subscribers.append(subscribers)
+        self.recording.append(recording)
+
+        self.connection_streams = dict(connection_streams or {})
+        silent_since = {}
+        for connection_id, (published, _) in self.connection_streams.items():
+            if not published:
+                silent_since[connection_id] = self.silent_since.get(connection_id, timestamp)
+        self.silent_since = silent_since
+
+    def anomalies(self, now: float, publisher_timeout: float) -> List[str]:
+        """
+        Get descriptions of the problems of the room at the time of the last sample.
+
+        :param float now: The current time as returned by `time.monotonic`
+        :param float publisher_timeout: Number of seconds a connection may go without publishing
+        """
+        anomalies = []
+        for connection_id, since in sorted(self.silent_since.items(), key=lambda item: item[1]):
+            if now - since > publisher_timeout:
+                anomalies.append('connection {} not publishing for {:.0f} seconds'.format(connection_id, now - since))
+        if self.recording_lost:
+            anomalies.append('recording stopped while participants are connected')
+        return anomalies
+
+    def summary(self, percentiles: Iterable[float] = (50, 90, 99)) -> dict:
+        """
+        Get percentile summaries of the stored samples.
+
+        :param percentiles: The percentiles to compute
+        """
+        samples = len(self.timestamps)
+        return {
+            "session_id": self.session_id,
+            "samples": samples,
+            "connections": {p: self.connections.percentile(p) for p in percentiles},
+            "publishers": {p: self.publishers.percentile(p) for p in percentiles},
+            "subscribers": {p: self.subscribers.percentile(p) for p in percentiles},
+            "recording_ratio": sum(self.recording.values()) / samples if samples else None,
+            "connection_streams": {connection_id: {"publishers": published, "subscribers": subscribed}
+                                   for connection_id, (published, subscribed) in self.connection_streams.items()},
+        }
+
+
+class HealthSampler:
+    """
+    Periodically samples all sessions managed by the bot. Each tick lists the session summaries of every server with a
+    single streamed request and stores the counters of the managed sessions in fixed-size ring buffers. No request is
+    sent while the bot manages no session.
+    """
+    def __init__(self, server, rooms: Callable[[], Iterable[str]], interval: float = 5, capacity: int = 720,
+                 publisher_timeout: float = 30, on_anomaly: Callable[[str, List[str]], None] = None,
+                 prefix: str = None):
+        """
+        :param server: The `Server` or `ServerPool` hosting the sessions
+        :param rooms: Returns the ids of the sessions to sample
+        :param float interval: Number of seconds between two samples
+        :param int capacity: Number of samples kept per room
+        :param float publisher_timeout: Number of seconds a connection may go without publishing before it is reported
+        :param on_anomaly: Called with the session id and the anomalies whenever a sample of a room is anomalous
+        :param str prefix: Common prefix of the ids of the sessions to sample, other sessions are skipped
+        """
+        self.server = server
+        self.rooms = rooms
+        self.interval = interval
+        self.capacity = capacity
+        self.publisher_timeout = publisher_timeout
+        self.on_anomaly = on_anomaly
+        self.prefix = prefix
+
+        self.health = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the HealthSampler class.
+        """
+        return logging.getLogger('bot.HealthSampler')
+
+    def sample(self):
+        """
+        Takes one sample of every managed session.
+        """
+        managed = set(self.rooms())
+        now = monotonic()
+
+        for session_id in self.health.keys() - managed:
+            del self.health[session_id]
+
+        if not managed:
+            return
+
+        # Summaries only keep the counters per connection, the other details are dropped while the listing is parsed
+        for session in self.server.iter_sessions(prefix=self.prefix, summary=True):
+            session_id = session.id
+            if session_id not in managed:
+                continue
+
+            health = self.health.get(session_id)
+            if health is None:
+                health = self.health[session_id] = RoomHealth(session_id, self.capacity)
+            health.record(now, session.number_of_connections, session.number_of_publishers,
+                          session.number_of_subscribers, session.recording, session.connection_streams)
+
+            if self.on_anomaly:
+                anomalies = health.anomalies(now, self.publisher_timeout)
+                if anomalies:
+                    self.on_anomaly(session_id, anomalies)
+
+    def summaries(self) -> Dict[str, dict]:
+        """
+        Get the percentile summaries of all sampled rooms.
+        """
+        return {session_id: health.summary() for session_id, health in self.health.items()}
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                self.logger.warning('Could not sample sessions: %s', e)
+
+    def start(self):
+        """
+        Starts sampling in a background thread.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='health-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling.
+        """
+        self._stopped.set()
@@ -0,0 +1,192 @@
+"""
+Leader election between bot instances through a lease in a shared SQLite database.
+
+The database must be on a file system with working POSIX locks shared by all instances, e.g. a volume mounted into
+every container on the same host. Network file systems often do not qualify.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+from time import monotonic, time
+from typing import Callable, Optional
+from uuid import uuid4
+
+
+class Lease:
+    """
+    A named lease which is held by at most one holder at a time. The holder has to renew it before `ttl` seconds have
+    passed, otherwise any other holder may take it over. Every takeover increments the term of the lease.
+    """
+    def __init__(self, path: str, name: str = 'audio-bot', holder: str = None, ttl: float = 10):
+        """
+        :param str path: Path of the SQLite database
+        :param str name: Name of the lease, instances competing for the same lease must use the same name
+        :param str holder: Identifier of this instance, unique by default
+        :param float ttl: Number of seconds a lease is valid after acquiring or renewing it
+        """
+        self.path = path
+        self.name = name
+        self.holder = holder or '{}-{}-{}'.format(socket.gethostname(), os.getpid(), uuid4().hex[:8])
+        self.ttl = ttl
+
+        connection = self._connect()
+        try:
+            connection.execute('CREATE TABLE IF NOT EXISTS lease ('
+                               'name TEXT PRIMARY KEY, holder TEXT NOT NULL, term INTEGER NOT NULL, '
+                               'expires_at REAL NOT NULL)')
+        finally:
+            connection.close()
+
+    def __repr__(self):
+        return str({
+            "path": self.path,
+            "name": self.name,
+            "holder": self.holder,
+            "ttl": self.ttl,
+        })
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call, as the lease is used from several threads
+        return sqlite3.connect(self.path, timeout=self.ttl / 2, isolation_level=None)
+
+    def acquire(self) -> Optional[int]:
+        """
+        Acquires or renews the lease.
+
+        :return: The term of the lease, or `None` if it is held by someone else
+        """
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT holder, term, expires_at FROM lease WHERE name = ?',
+                                     (self.name,)).fetchone()
+            now = time()
+            if row is None:
+                term = 1
+            elif row[0] == self.holder:
+                term = row[1]
+            elif row[2] < now:
+                term = row[1] + 1
+            else:
+                connection.execute('ROLLBACK')
+                return None
+            connection.execute('INSERT OR REPLACE INTO lease (name, holder, term, expires_at) VALUES (?, ?, ?, ?)',
+                               (self.name, self.holder, term, now + self.ttl))
+            connection.execute('COMMIT')
+            return term
+        except sqlite3.Error:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def release(self):
+        """
+        Gives up the lease if it is held by this instance, so another instance can take over without waiting for it
+        to expire.
+        """
+        connection = self._connect()
+        try:
+            # The row is kept, so the term keeps increasing
+            connection.execute('UPDATE lease SET expires_at = 0 WHERE name = ? AND holder = ?',
+                               (self.name, self.holder))
+        finally:
+            connection.close()
+
+
+class LeaderElector:
+    """
+    Competes for a `Lease` in a background thread and keeps renewing it while leading.
+
+    Leadership is assumed to end `ttl` seconds after the last successful renewal started, even if the database cannot
+    be reached, so two instances never consider themselves leader at the same time.
+    """
+    def __init__(self, lease: Lease, interval: float = None, on_elected: Callable[[int], None] = None,
+                 on_demoted: Callable[[], None] = None):
+        """
+        :param Lease lease: The lease to compete for
+        :param float interval: Number of seconds between two attempts, a third of the lease's ttl by default
+        :param on_elected: Called with the term once this instance became leader
+        :param on_demoted: Called once this instance lost the leadership
+        """
+        self.lease = lease
+        self.interval = interval if interval is not None else lease.ttl / 3
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+
+        self.term = None
+        self._leading = False
+        self._valid_until = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the LeaderElector class.
+        """
+        return logging.getLogger('bot.LeaderElector')
+
+    @property
+    def is_leader(self) -> bool:
+        """
+        Get whether this instance currently holds the lease.
+        """
+        return self._leading and monotonic() < self._valid_until
+
+    def _attempt(self):
+        started_at = monotonic()
+        try:
+            term = self.lease.acquire()
+        except sqlite3.Error as e:
+            self.logger.warning('Could not renew lease: %s', e)
+            if self._leading and monotonic() >= self._valid_until:
+                self._demote()
+            return
+
+        if term is None:
+            if self._leading:
+                self._demote()
+            return
+
+        self._valid_until = started_at + self.lease.ttl
+        if not self._leading:
+            self._leading = True
+            self.term = term
+            self.logger.info('%s became leader in term %d', self.lease.holder, term)
+            if self.on_elected is not None:
+                self.on_elected(term)
+
+    def _demote(self):
+        self._leading = False
+        self.logger.warning('%s lost the leadership of term %s', self.lease.holder, self.term)
+        if self.on_demoted is not None:
+            self.on_demoted()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._attempt()
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        """
+        Starts competing for the lease.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='leader-elector', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops competing and releases the lease if it is held.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._leading:
+            self._leading = False
+            self.lease.release()
@@ -0,0 +1,167 @@
+"""
+On-demand profiling of the running bot.
+
+A profile is started at runtime, e.g. by sending `SIGUSR1` to the process. For a fixed duration, the stacks of all
+threads are sampled and the time spent in instrumented handlers is accumulated. Afterwards, the stacks are written in
+the collapsed format understood by flamegraph tools, and the handler timings are written as a table. While no profile
+is running, instrumented functions only pay for a single attribute check.
+"""
+
+import functools
+import logging
+import os
+import signal
+import sys
+import threading
+from collections import Counter
+from time import perf_counter, sleep, strftime
+from typing import Callable, Union
+
+
+class Profiler:
+    """
+    Time-boxed sampling profiler with per-handler timings.
+    """
+    def __init__(self, output_dir: str = '.', duration: float = 30, interval: float = 0.005):
+        """
+        :param str output_dir: Directory the profiles are written to
+        :param float duration: Number of seconds a profile runs
+        :param float interval: Number of seconds between two stack samples
+        """
+        self.output_dir = output_dir
+        self.duration = duration
+        self.interval = interval
+
+        self.active = False
+        self._requested = False
+        self._request_interval = 0.5
+        self._stacks = Counter()
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the Profiler class.
+        """
+        return logging.getLogger('bot.Profiler')
+
+    def _record(self, label: str, elapsed: float):
+        with self._lock:
+            calls, total = self._timings.get(label, (0, 0.0))
+            self._timings[label] = (calls + 1, total + elapsed)
+
+    def timed(self, label: Union[str, Callable[..., str]]):
+        """
+        Decorator accumulating the time spent in the decorated function while a profile is running.
+
+        :param label: Name under which the time is reported, or a function computing it from the call arguments
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.active:
+                    return function(*args, **kwargs)
+                started_at = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self._record(label(*args, **kwargs) if callable(label) else label, perf_counter() - started_at)
+            return wrapper
+        return decorator
+
+    def instrument(self, owner, attribute: str, label: Union[str, Callable[..., str]]):
+        """
+        Replaces `owner.attribute` by a version decorated with `timed`.
+
+        :param owner: Class or module owning the function
+        :param str attribute: Name of the function
+        :param label: See `timed`
+        """
+        setattr(owner, attribute, self.timed(label)(getattr(owner, attribute)))
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self._stacks[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        expires_at = perf_counter() + self.duration
+        try:
+            while perf_counter() < expires_at:
+                self._sample()
+                sleep(self.interval)
+        finally:
+            self.active = False
+            self.dump()
+
+    def start(self) -> bool:
+        """
+        Starts a profile in a background thread.
+
+        :return: `False` if a profile is already running
+        """
+        with self._lock:
+            if self.active:
+                return False
+            self.active = True
+            self._stacks = Counter()
+            self._timings = {}
+
+        self.logger.info('Profiling for %s seconds', self.duration)
+        threading.Thread(target=self._run, name='profiler', daemon=True).start()
+        return True
+
+    def dump(self) -> str:
+        """
+        Writes the collected stacks and handler timings to `output_dir`.
+
+        :return: The common prefix of the written files
+        """
+        prefix = os.path.join(self.output_dir, strftime('profile-%Y%m%d-%H%M%S'))
+        with self._lock:
+            stacks = self._stacks
+            timings = sorted(self._timings.items(), key=lambda item: item[1][1], reverse=True)
+
+        with open(prefix + '.folded', 'w') as file:
+            for stack, count in stacks.items():
+                file.write('{} {}\n'.format(stack, count))
+
+        with open(prefix + '.handlers.tsv', 'w') as file:
+            file.write('handler\tcalls\ttotal_seconds\tmean_seconds\n')
+            for label, (calls, total) in timings:
+                file.write('{}\t{}\t{:.6f}\t{:.6f}\n'.format(label, calls, total, total / calls))
+
+        self.logger.info('Profile written to %s.folded and %s.handlers.tsv', prefix, prefix)
+        return prefix
+
+    def _watch_requests(self):
+        while True:
+            sleep(self._request_interval)
+            if self._requested:
+                self._requested = False
+                self.start()
+
+    def install_signal_handler(self, signum: int = signal.SIGUSR1, interval: float = 0.5):
+        """
+        Starts a profile whenever the process receives `signum`.
+
+        The handler runs in the main thread in between any two bytecodes, possibly while the main thread holds a lock of
+        the profiler or of `logging`. So it only sets a flag, and a background thread polling the flag every `interval`
+        seconds starts the profile.
+        """
+        def request(*_):
+            self._requested = True
+
+        self._request_interval = interval
+        signal.signal(signum, request)
+        threading.Thread(target=self._watch_requests, name='profiler-signal', daemon=True).start()
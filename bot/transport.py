@@ -0,0 +1,174 @@
+"""
+Connection management between the bot and the slurk chat server.
+"""
+
+import logging
+import random
+from time import monotonic, sleep
+from typing import Callable, Sequence
+
+from socketIO_client import SocketIO
+from socketIO_client.exceptions import ConnectionError, TimeoutError
+
+
+class _SocketIO(SocketIO):
+    """
+    `SocketIO` recording when the last packet was received.
+    """
+    def __init__(self, *args, **kwargs):
+        self.last_packet_at = monotonic()
+        super().__init__(*args, **kwargs)
+
+    def _process_packet(self, packet):
+        self.last_packet_at = monotonic()
+        return super()._process_packet(packet)
+
+
+class SlurkTransport:
+    """
+    Keeps a socket.io connection to slurk alive.
+
+    socketIO_client always performs the handshake over XHR polling and then probes a WebSocket upgrade if `websocket`
+    is among the transports. If the upgrade fails, the connection silently stays on polling; this is logged as a
+    warning, or treated as a failed connection with `require_websocket`.
+
+    The client pings the server every ping interval announced in the handshake. A connection which did not receive any
+    packet, including the pongs, for `liveness_timeout` seconds is considered half-open. A dropped or half-open
+    connection is re-established with exponential backoff and the namespace's `on_reconnect` handler is invoked to
+    restore room subscriptions.
+    """
+    def __init__(self, host: str, port: int, headers: dict, namespace: Callable,
+                 transports: Sequence[str] = ('websocket',), heartbeat_interval: float = 5,
+                 min_backoff: float = 0.5, max_backoff: float = 30, liveness_timeout: float = None,
+                 require_websocket: bool = False):
+        """
+        :param str host: Full URL of the chat server
+        :param int port: Port of the chat server
+        :param dict headers: Headers sent with the handshake, e.g. the authorization token
+        :param namespace: Namespace class, or a factory with the same signature, instanced for every connection
+        :param transports: Transports the connection may be upgraded to
+        :param float heartbeat_interval: Number of seconds between liveness checks of the connection
+        :param float min_backoff: Initial delay in seconds before reconnecting
+        :param float max_backoff: Maximum delay in seconds before reconnecting
+        :param float liveness_timeout: Number of seconds without any received packet after which the connection is
+            re-established. Defaults to the sum of the ping interval and the ping timeout announced by the server.
+        :param bool require_websocket: Reconnect instead of staying on polling if the WebSocket upgrade failed
+        """
+        self.host = host
+        self.port = port
+        self.headers = headers
+        self.namespace = namespace
+        self.transports = list(transports)
+        self.heartbeat_interval = heartbeat_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.liveness_timeout = liveness_timeout
+        self.require_websocket = require_websocket
+
+        self.io = None
+        self.connections = 0
+        self._running = False
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the SlurkTransport class.
+        """
+        return logging.getLogger('bot.SlurkTransport')
+
+    def _connect(self) -> SocketIO:
+        return _SocketIO(self.host, self.port,
+                        headers=self.headers,
+                        Namespace=self.namespace,
+                        transports=self.transports,
+                        wait_for_connection=False)
+
+    def _engineio_session(self):
+        return getattr(self.io, '_engineIO_session', None)
+
+    def _check_transport(self):
+        transport = getattr(self.io, 'transport_name', None)
+        if 'websocket' not in self.transports or transport == 'websocket':
+            return
+        if self.require_websocket:
+            raise ConnectionError('WebSocket upgrade failed, transport is {}'.format(transport))
+        self.logger.warning('WebSocket upgrade failed, events are received over %s', transport)
+
+    def _check_liveness(self):
+        timeout = self.liveness_timeout
+        if timeout is None:
+            session = self._engineio_session()
+            timeout = session.ping_interval + session.ping_timeout if session else 60
+        silent = monotonic() - self.io.last_packet_at
+        if silent > timeout:
+            raise ConnectionError('no packet received for {:.1f} seconds'.format(silent))
+
+    def _resubscribe(self):
+        self.logger.info('Reconnected to %s', self.host)
+        on_reconnect = getattr(self.io.get_namespace(), 'on_reconnect', None)
+        if on_reconnect:
+            on_reconnect()
+
+    def _serve(self):
+        """
+        Processes events until the connection is lost. If socketIO_client re-established the connection on its own, a
+        new engine.io session is opened and the rooms are re-joined as well.
+        """
+        self._check_transport()
+        session = self._engineio_session()
+        while self._running:
+            self.io.wait(seconds=self.heartbeat_interval)
+            if not self.io.connected:
+                raise ConnectionError('connection lost')
+            if self._engineio_session() is not session:
+                session = self._engineio_session()
+                self._check_transport()
+                self._resubscribe()
+            self._check_liveness()
+
+    def run(self):
+        """
+        Connects to the chat server and processes events until `stop` is called.
+        """
+        self._running = True
+        backoff = self.min_backoff
+
+        while self._running:
+            connected_at = None
+            try:
+                self.io = self._connect()
+                connected_at = monotonic()
+                self.connections += 1
+                if self.connections > 1:
+                    self._resubscribe()
+                self._serve()
+            except (ConnectionError, TimeoutError) as e:
+                self.logger.warning('Connection to %s failed: %s', self.host, e)
+            finally:
+                self._disconnect()
+
+            if not self._running:
+                break
+
+            # Only keep backing off if the last connection did not survive for long
+            if connected_at is not None and monotonic() - connected_at > self.max_backoff:
+                backoff = self.min_backoff
+            delay = random.uniform(backoff / 2, backoff)
+            self.logger.info('Reconnecting in %.1f seconds', delay)
+            sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def stop(self):
+        """
+        Stops processing events and closes the connection.
+        """
+        self._running = False
+
+    def _disconnect(self):
+        if self.io is None:
+            return
+        try:
+            self.io.disconnect()
+        except Exception as e:
+            self.logger.debug('Error while disconnecting: %s', e)
+        self.io = None
@@ -4,12 +4,28 @@ API binding for the OpenVidu media server.
 
 import logging
 import base64
-from typing import List, Optional
+import codecs
+import functools
+import re
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 from datetime import datetime
 from json import JSONDecodeError
 
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+from .events import SessionSnapshot, SessionEvent, ConnectionAdded, ConnectionRemoved, PublisherStarted, \
+    RecordingToggled, SessionClosed, ServerWatcher, diff_snapshots
+from .tokens import TokenCache
+from . import codec
+from .codec import BodyTemplate
+from .pool import ServerPool
+from .singleflight import SingleFlight
+from .ratelimit import AdmissionController, PRIORITY_TOKEN, PRIORITY_RECORDING, PRIORITY_HOUSEKEEPING
 
 
 class OpenViduException(Exception):
@@ -23,15 +39,204 @@ class OpenViduException(Exception):
         :param status_code: Return code of the API call
         :param error: Either a string, or a JSON-string with a `message` key
         """
+        self.status_code = status_code
         if error:
             try:
-                super().__init__('{}: {}'.format(status_code, json.loads(error)['message']))
-            except (KeyError, JSONDecodeError):
+                super().__init__('{}: {}'.format(status_code, codec.loads(error)['message']))
+            except (KeyError, TypeError, ValueError):
                 super().__init__('{}: {}'.format(status_code, error))
         else:
             super().__init__('{}: Unknown error'.format(status_code))
 
 
+_deadline = threading.local()
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """
+    Bounds all API calls the current thread sends within the block to end `seconds` from now. Each call gets the
+    remaining time as its timeout, calls sent after the deadline raise `requests.Timeout` right away.
+
+    :param float seconds: Number of seconds until the deadline
+    """
+    previous = getattr(_deadline, 'expires_at', None)
+    _deadline.expires_at = monotonic() + seconds
+    try:
+        yield
+    finally:
+        _deadline.expires_at = previous
+
+
+def _remaining_time(what: str) -> Optional[float]:
+    """
+    Get the number of seconds left until the deadline set by `request_deadline`, or `None` if there is none.
+
+    :param str what: Description of the pending operation used in the error message
+    :raises requests.Timeout: If the deadline has passed
+    """
+    expires_at = getattr(_deadline, 'expires_at', None)
+    if expires_at is None:
+        return None
+    remaining = expires_at - monotonic()
+    if remaining <= 0:
+        raise requests.Timeout('Deadline exceeded before {}'.format(what))
+    return remaining
+
+
+def _with_deadline(what: str, kwargs: dict) -> dict:
+    """
+    Bound the `timeout` of a request by the time left until the deadline set by `request_deadline`.
+
+    :param str what: Description of the request used in the error message
+    :param dict kwargs: Parameters passed to `requests.Session.request`
+    :return: The parameters with the bounded timeout
+    """
+    remaining = _remaining_time(what)
+    if remaining is None:
+        return kwargs
+    timeout = kwargs.get('timeout')
+    return dict(kwargs, timeout=remaining if timeout is None else min(timeout, remaining))
+
+
+_STREAM_CHUNK_SIZE = 16 * 1024
+_TEMPLATE_CACHE_SIZE = 64
+_STREAM_THRESHOLD = 8 * 1024 * 1024
+_SEPARATORS = re.compile(r'[ \t\n\r,:]*')
+_DELIMITERS = ' \t\n\r,:]}'
+
+
+def _iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[dict]:
+    """
+    Incrementally decode the elements of the array stored under `key` in a streamed JSON object.
+
+    Only the value currently being decoded is buffered, so memory does not grow with the length of the array. Values
+    of the keys preceding `key` are decoded and discarded. Values are decoded with the C accelerated decoder of the
+    standard library, which finds the end of a value faster than any scan in Python, so the codec selected in
+    `openvidu.codec` is not used here. A value which is incomplete is only decoded again once its buffered part
+    doubled, so values larger than a chunk are decoded a constant number of times on average.
+
+    :param chunks: The raw response body in chunks
+    :param str key: Name of the top level key holding the array
+    :return: An iterator over the decoded elements
+    """
+    decoder = json.JSONDecoder()
+    decode = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    start = 0
+    # Text received since the buffer was last joined, which is only done when it is decoded to avoid repeated copies
+    parts = []
+    pending = 0
+    exhausted = False
+
+    def fill():
+        nonlocal exhausted, pending
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            text = decode.decode(b'', final=True)
+        else:
+            text = decode.decode(chunk)
+        parts.append(text)
+        pending += len(text)
+
+    def join():
+        nonlocal buffer, start, pending
+        if parts:
+            buffer = buffer[start:] + ''.join(parts)
+            start = 0
+            parts.clear()
+            pending = 0
+
+    def peek() -> str:
+        # Skips separators and returns the next character, or an empty string at the end of the body
+        nonlocal start
+        while True:
+            join()
+            start = _SEPARATORS.match(buffer, start).end()
+            if start < len(buffer):
+                return buffer[start]
+            if exhausted:
+                return ''
+            fill()
+
+    def value():
+        nonlocal start
+        retry_length = 0
+        while True:
+            if exhausted or len(buffer) - start + pending >= retry_length:
+                join()
+                try:
+                    result, end = decoder.raw_decode(buffer, start)
+                except JSONDecodeError:
+                    if exhausted:
+                        raise
+                    end = None
+                # A number or literal is only complete once a delimiter follows, e.g. `1` may continue as `12`
+                if end is not None and (exhausted or end < len(buffer) and buffer[end] in _DELIMITERS):
+                    start = end
+                    return result
+                retry_length = 2 * (len(buffer) - start)
+            fill()
+
+    if peek() != '{':
+        return
+    start += 1
+    while True:
+        if peek() in ('}', ''):
+            return
+        name = value()
+        if name == key:
+            break
+        peek()
+        value()
+
+    if peek() != '[':
+        return
+    start += 1
+    while True:
+        character = peek()
+        if character == ']':
+            return
+        if not character:
+            raise JSONDecodeError('Unterminated array', buffer, start)
+        yield value()
+
+
+@functools.lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _token_template(role, kurento_options) -> BodyTemplate:
+    constant = {"role": role}
+    if kurento_options:
+        constant["kurentoOptions"] = {key: list(value) if isinstance(value, tuple) else value
+                                      for key, value in kurento_options}
+    return BodyTemplate(constant)
+
+
+@functools.lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _recording_template(output_mode, has_audio, has_video, recording_layout, custom_layout, resolution) -> BodyTemplate:
+    return BodyTemplate({
+        "outputMode": output_mode,
+        "hasAudio": has_audio,
+        "hasVideo": has_video,
+        "recordingLayout": recording_layout,
+        "customLayout": custom_layout,
+        "resolution": resolution,
+    })
+
+
+@functools.lru_cache(maxsize=_TEMPLATE_CACHE_SIZE)
+def _session_template(media_mode, recording_mode, default_output_mode, default_recording_layout,
+                      default_custom_layout) -> BodyTemplate:
+    return BodyTemplate({
+        "mediaMode": media_mode,
+        "recordingMode": recording_mode,
+        "defaultOutputMode": default_output_mode,
+        "defaultRecordingLayout": default_recording_layout,
+        "defaultCustomLayout": default_custom_layout,
+    })
+
+
 class Connection:
     """
     A connection of a client
@@ -148,10 +353,8 @@ class Connection:
         """
         Forces a disconnection of a user
         """
-        response = requests.post('{}/api/sessions/{}/connection/{}'.format(self.server.url, self.session_id, self.id),
-                                 verify=self.server.verify,
-                                 headers=self.server.request_headers
-                                 )
+        response = self.server._request('DELETE', '/api/sessions/{}/connection/{}'.format(self.session_id, self.id),
+                                        endpoint='connections', priority=PRIORITY_HOUSEKEEPING)
 
         if response.status_code == 204:
             self.logger.info('Connection `%s` closed', self.id)
@@ -217,32 +420,32 @@ class Token:
         return self._data['data']
 
     @property
-    def video_min_send_bandwith(self):
+    def video_min_send_bandwith(self) -> Optional[int]:
         """
         Get the minimum number of Kbps that the client owning the token will try to send to Kurento Media Server.
         """
-        return self._data['kurentoOptions']['videoMinSendBandwidth']
+        return self._data.get('kurentoOptions', {}).get('videoMinSendBandwidth')
 
     @property
-    def video_max_send_bandwith(self):
+    def video_max_send_bandwith(self) -> Optional[int]:
         """
         Get the maximum number of Kbps that the client owning the token will try to send to Kurento Media Server.
         """
-        return self._data['kurentoOptions']['videoMaxSendBandwidth']
+        return self._data.get('kurentoOptions', {}).get('videoMaxSendBandwidth')
 
     @property
-    def video_min_recv_bandwith(self):
+    def video_min_recv_bandwith(self) -> Optional[int]:
         """
         Get the minimum number of Kbps that the client owning the token will try to receive from Kurento Media Server.
         """
-        return self._data['kurentoOptions']['videoMinRecvBandwidth']
+        return self._data.get('kurentoOptions', {}).get('videoMinRecvBandwidth')
 
     @property
-    def video_max_recv_bandwith(self):
+    def video_max_recv_bandwith(self) -> Optional[int]:
         """
         Get the maximum number of Kbps that the client owning the token will try to receive from Kurento Media Server.
         """
-        return self._data['kurentoOptions']['videoMaxRecvBandwidth']
+        return self._data.get('kurentoOptions', {}).get('videoMaxRecvBandwidth')
 
 
 class Recording:
@@ -293,7 +496,7 @@ class Recording:
         """
         Get the session associated to the recording (same value as session in the body request).
         """
-        return self._data['session_id']
+        return self._data['sessionId']
 
     @property
     def name(self) -> str:
@@ -391,18 +594,20 @@ class Recording:
 
     def update(self, _id=None):
         """
-        Updates the data fields of this recording.
+        Updates the data fields of this recording. Concurrent updates of the same recording share a single request.
         """
         if not _id:
             _id = self.id
 
-        response = requests.get('{}/api/recordings/{}'.format(self.server.url, _id),
-                                verify=self.server.verify,
-                                headers=self.server.request_headers,
-                                )
+        self._data = self.server.single_flight.do(('recording', _id), self._fetch, _id,
+                                                  timeout=_remaining_time('updating recording ' + _id))
+
+    def _fetch(self, _id) -> dict:
+        response = self.server._request('GET', '/api/recordings/{}'.format(_id),
+                                        endpoint='recordings', priority=PRIORITY_HOUSEKEEPING)
 
         if response.status_code == 200:
-            self._data = response.json()
+            return codec.loads(response.content)
         elif response.status_code == 404:
             raise OpenViduException(response.status_code, 'Recording `{}` does not exist'.format(_id))
         else:
@@ -412,14 +617,12 @@ class Recording:
         """
         Stops recording.
         """
-        response = requests.post('{}/api/recordings/stop/{}'.format(self.server.url, self.id),
-                                 verify=self.server.verify,
-                                 headers=self.server.request_headers
-                                 )
+        response = self.server._request('POST', '/api/recordings/stop/{}'.format(self.id),
+                                        endpoint='recordings', priority=PRIORITY_RECORDING)
 
         if response.status_code == 200:
             self.logger.info('Recording of session `%s` stopped', self.id)
-            self._data = response.json()
+            self._data = codec.loads(response.content)
         elif response.status_code == 404:
             raise OpenViduException(response.status_code, 'Recording `{}` does not exist'.format(self.id))
         else:
@@ -443,6 +646,7 @@ class Session:
             self._data = _data
         else:
             self.update(id)
+        self._snapshot = SessionSnapshot.from_data(self._data)
 
     def __repr__(self):
         return str({
@@ -546,31 +750,46 @@ class Session:
 
     def update(self, _id=None):
         """
-        Updates the data fields of the session.
+        Updates the data fields of the session. Concurrent updates of the same session share a single request.
         """
         if not _id:
             _id = self.id
 
-        response = requests.get('{}/api/sessions/{}'.format(self.server.url, _id),
-                                verify=self.server.verify,
-                                headers=self.server.request_headers,
-                                )
+        self._data = self.server.single_flight.do(('session', _id), self._fetch, _id,
+                                                  timeout=_remaining_time('updating session ' + _id))
+
+    def _fetch(self, _id) -> dict:
+        response = self.server._request('GET', '/api/sessions/{}'.format(_id),
+                                        endpoint='sessions', priority=PRIORITY_TOKEN)
 
         if response.status_code == 200:
-            self._data = response.json()
+            return codec.loads(response.content)
         elif response.status_code == 404:
             raise OpenViduException(response.status_code, 'Session `{}` does not exist'.format(_id))
         else:
             raise OpenViduException(response.status_code, response.content.decode('utf-8'))
 
+    def poll_changes(self) -> List[SessionEvent]:
+        """
+        Updates the session and returns the changes since the last call, or since the session object was created.
+
+        Connections are compared by their id, so only the connection and stream identifiers of the previous state are
+        retained between calls.
+
+        :return: A list of `ConnectionAdded`, `ConnectionRemoved`, `PublisherStarted` and `RecordingToggled` events
+        """
+        self.update()
+        snapshot = SessionSnapshot.from_data(self._data)
+        events = list(diff_snapshots(self._snapshot, snapshot))
+        self._snapshot = snapshot
+        return events
+
     def close(self):
         """
         Closes the session
         """
-        response = requests.delete('{}/api/sessions/{}'.format(self.server.url, self.id),
-                                   verify=self.server.verify,
-                                   headers=self.server.request_headers,
-                                   )
+        response = self.server._request('DELETE', '/api/sessions/{}'.format(self.id),
+                                        endpoint='sessions', priority=PRIORITY_HOUSEKEEPING)
 
         if response.status_code == 204:
             self.logger.info('Session `%s` has been closed', self.id)
@@ -609,28 +828,25 @@ class Session:
             will be able to apply (see Voice and video filters)
         :return: The generated token
         """
-        if not allowed_filters:
-            allowed_filters = []
-
-        response = requests.post('{}/api/tokens'.format(self.server.url),
-                                 verify=self.server.verify,
-                                 headers=self.server.request_headers,
-                                 data=json.dumps({
-                                     "session": self.id,
-                                     "role": role,
-                                     "data": data,
-                                    #  "kurentoOptions": json.dumps({
-                                    #      "videoMinSendBandwidth": video_min_send_bandwidth,
-                                    #      "videoMaxSendBandwidth": video_max_send_bandwidth,
-                                    #      "videoMinRecvBandwidth": video_min_recv_bandwidth,
-                                    #      "videoMaxRecvBandwidth": video_max_recv_bandwidth,
-                                    #      "allowedFilters": allowed_filters,
-                                    #  }),
-                                 })
-                                 )
+        kurento_options = {}
+        if video_min_send_bandwidth is not None:
+            kurento_options['videoMinSendBandwidth'] = video_min_send_bandwidth
+        if video_max_send_bandwidth is not None:
+            kurento_options['videoMaxSendBandwidth'] = video_max_send_bandwidth
+        if video_min_recv_bandwidth is not None:
+            kurento_options['videoMinRecvBandwidth'] = video_min_recv_bandwidth
+        if video_max_recv_bandwidth is not None:
+            kurento_options['videoMaxRecvBandwidth'] = video_max_recv_bandwidth
+        if allowed_filters is not None:
+            kurento_options['allowedFilters'] = tuple(allowed_filters)
+
+        body = _token_template(role, tuple(kurento_options.items())).render(session=self.id, data=data)
+
+        response = self.server._request('POST', '/api/tokens', endpoint='tokens', priority=PRIORITY_TOKEN,
+                                        data=body)
 
         if response.status_code == 200:
-            data = response.json()
+            data = codec.loads(response.content)
             self.logger.info('Token created: `%s`', data['id'])
             return Token(data)
         elif response.status_code == 404:
@@ -644,10 +860,8 @@ class Session:
 
         :param str stream: Stream id to unpublish.
         """
-        response = requests.post('{}/api/sessions/{}/stream/{}'.format(self.server.url, self.id, stream),
-                                 verify=self.server.verify,
-                                 headers=self.server.request_headers
-                                 )
+        response = self.server._request('DELETE', '/api/sessions/{}/stream/{}'.format(self.id, stream),
+                                        endpoint='streams', priority=PRIORITY_HOUSEKEEPING)
 
         if response.status_code == 204:
             self.logger.info('Stream `%s` unpublished', stream)
@@ -685,24 +899,15 @@ class Session:
             "1920x1080". Values for both width and height must be between 100 and 1999.
         :return: The recording
         """
-        response = requests.post('{}/api/recordings/start'.format(self.server.url),
-                                 verify=self.server.verify,
-                                 headers=self.server.request_headers,
-                                 data=json.dumps({
-                                     "session": self.id,
-                                     "name": name,
-                                     "outputMode": output_mode,
-                                     "hasAudio": has_audio,
-                                     "hasVideo": has_video,
-                                     "recordingLayout": recording_layout,
-                                     "customLayout": custom_layout,
-                                     "resolution": resolution,
-                                 })
-                                 )
+        response = self.server._request('POST', '/api/recordings/start', endpoint='recordings',
+                                        priority=PRIORITY_RECORDING,
+                                        data=_recording_template(output_mode, has_audio, has_video, recording_layout,
+                                                                 custom_layout, resolution).render(session=self.id,
+                                                                                                   name=name))
 
         if response.status_code == 200:
             self.logger.info('Recording of session `%s` started', self.id)
-            return Recording(self.server, None, _data=response.json())
+            return Recording(self.server, None, _data=codec.loads(response.content))
         elif response.status_code == 422:
             raise OpenViduException(response.status_code, '`resolution` exceeds accaptable values')
         elif response.status_code == 404:
@@ -720,29 +925,86 @@ class Session:
             raise OpenViduException(response.status_code, response.content.decode('utf-8'))
 
 
+class SessionSummary:
+    """
+    Lightweight view of a session which only carries its identifier and counters. Instead of directly instancing this,
+    you should call `Server.iter_sessions(summary=True)`.
+    """
+    __slots__ = ('id', 'custom_session_id', 'created_at', 'recording', 'number_of_connections', 'number_of_publishers',
+                 'number_of_subscribers', 'number_of_silent_connections', 'connection_streams')
+
+    def __init__(self, data):
+        """
+        Creates a summary from the session data returned by the server. Of the connection details only the number of
+        published and subscribed streams per connection are retained.
+
+        :param dict data: Dictionary of data
+        """
+        self.id = data['sessionId']
+        self.custom_session_id = data.get('customSessionId') or None
+        self.created_at = datetime.utcfromtimestamp(data['createdAt'] / 1000)
+        self.recording = data['recording']
+        self.number_of_connections = data['connections']['numberOfElements']
+        self.number_of_publishers = 0
+        self.number_of_subscribers = 0
+        self.number_of_silent_connections = 0
+        # Connection id mapped to the number of published and subscribed streams of the connection
+        self.connection_streams = {}
+        for connection in data['connections']['content']:
+            published = len(connection.get('publishers') or ())
+            subscribed = len(connection.get('subscribers') or ())
+            self.connection_streams[connection['connectionId']] = (published, subscribed)
+            self.number_of_publishers += published
+            self.number_of_subscribers += subscribed
+            if not published:
+                self.number_of_silent_connections += 1
+
+    def __repr__(self):
+        return str({
+            "id": self.id,
+            "custom_session_id": self.custom_session_id,
+            "created_at": str(self.created_at),
+            "recording": self.recording,
+            "number_of_connections": self.number_of_connections,
+            "number_of_publishers": self.number_of_publishers,
+            "number_of_subscribers": self.number_of_subscribers,
+            "number_of_silent_connections": self.number_of_silent_connections,
+            "connection_streams": self.connection_streams,
+        })
+
+
 class Server:
     """
     Main class for communicating with the openvidu backend.
     """
-    def __init__(self, url, secret, verify=True):
+    def __init__(self, url, secret, verify=True, rate_limit: float = None, burst: int = None,
+                 concurrency: Dict[str, int] = None, default_concurrency: int = None, pool_size: int = 32):
         """
         Creates and verifies a new Server from an url, and a secret.
 
         :param str secret: The secret used to authenticate with the openvidu server
         :param str url: The URL where openvidu listens to api calls
         :param bool verify: Verify certificates
+        :param float rate_limit: Maximum number of API calls per second, or `None` for no limit
+        :param int burst: Number of API calls which may exceed `rate_limit` in a burst
+        :param dict concurrency: Maximum number of API calls in flight per endpoint (`sessions`, `tokens`,
+            `recordings`, `connections`, `streams` or `config`)
+        :param int default_concurrency: Maximum number of API calls in flight for endpoints not listed in `concurrency`
+        :param int pool_size: Number of HTTP connections kept open to the server for concurrent API calls
         """
         self.url = url
         self.verify = verify
         self._auth_token = base64.b64encode(bytes('OPENVIDUAPP:' + secret, 'utf8')).decode('utf8')
+        self.admission = AdmissionController(rate=rate_limit, burst=burst, concurrency=concurrency,
+                                             default_concurrency=default_concurrency)
+        self.single_flight = SingleFlight()
+        self._http = requests.Session()
+        self._http.mount(url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
 
-        response = requests.get('{}/config'.format(self.url),
-                                verify=self.verify,
-                                headers=self.request_headers
-                                )
+        response = self._request('GET', '/config', endpoint='config', priority=PRIORITY_HOUSEKEEPING)
 
         if response.status_code == 200:
-            self._config = response.json()
+            self._config = codec.loads(response.content)
         else:
             raise OpenViduException(response.status_code, response.content.decode('utf-8'))
 
@@ -841,6 +1103,48 @@ class Server:
             "Content-Type": 'application/json',
         }
 
+    def _request(self, method: str, path: str, endpoint: str, priority: int, **kwargs) -> requests.Response:
+        """
+        Sends an API call once it is admitted by the rate and concurrency limits.
+
+        :param str method: HTTP method
+        :param str path: Path of the API call relative to the server URL
+        :param str endpoint: Name of the endpoint the concurrency limit is applied to
+        :param int priority: Priority class of the call, see `openvidu.ratelimit`
+        :param kwargs: Additional parameters passed to `requests.Session.request`. If `stream` is set, the call stays
+            admitted until the response is closed, as reading the body is part of the call.
+        :return: The response
+        """
+        what = 'calling {}'.format(path)
+        # Waiting for admission counts against the deadline, the remaining time is applied to the call afterwards
+        remaining = _remaining_time(what)
+        if not kwargs.get('stream'):
+            with self.admission.admit(endpoint, priority, remaining):
+                return self._http.request(method, self.url + path, verify=self.verify, headers=self.request_headers,
+                                          **_with_deadline(what, kwargs))
+
+        self.admission.acquire(endpoint, priority, remaining)
+        try:
+            response = self._http.request(method, self.url + path, verify=self.verify, headers=self.request_headers,
+                                          **_with_deadline(what, kwargs))
+        except BaseException:
+            self.admission.release(endpoint)
+            raise
+
+        close = response.close
+        released = threading.Lock()
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                # Only the first close releases the admission
+                if released.acquire(blocking=False):
+                    self.admission.release(endpoint)
+
+        response.close = close_and_release
+        return response
+
     def initialize_session(self, custom_session_id: str = None, media_mode='ROUTED', recording_mode='MANUAL',
                            default_output_mode='COMPOSED', default_recording_layout='BEST_FIT',
                            default_custom_layout='') -> Session:
@@ -871,21 +1175,24 @@ class Server:
             openvidu.recording.custom-layout)
         :return: the session
         """
-        response = requests.post('{}/api/sessions'.format(self.url),
-                                 verify=self.verify,
-                                 headers=self.request_headers,
-                                 data=json.dumps({
-                                     "mediaMode": media_mode,
-                                     "recordingMode": recording_mode,
-                                     "customSessionId": custom_session_id,
-                                     "defaultOutputMode": default_output_mode,
-                                     "defaultRecordingLayout": default_recording_layout,
-                                     "defaultCustomLayout": default_custom_layout,
-                                 })
-                                 )
+        if custom_session_id:
+            # Initializing a session with a custom id is idempotent, concurrent calls share a single request
+            return self.single_flight.do(('initialize_session', custom_session_id), self._initialize_session,
+                                         custom_session_id, media_mode, recording_mode, default_output_mode,
+                                         default_recording_layout, default_custom_layout,
+                                         timeout=_remaining_time('initializing session ' + custom_session_id))
+        return self._initialize_session(custom_session_id, media_mode, recording_mode, default_output_mode,
+                                        default_recording_layout, default_custom_layout)
+
+    def _initialize_session(self, custom_session_id, media_mode, recording_mode, default_output_mode,
+                            default_recording_layout, default_custom_layout) -> Session:
+        response = self._request('POST', '/api/sessions', endpoint='sessions', priority=PRIORITY_TOKEN,
+                                 data=_session_template(media_mode, recording_mode, default_output_mode,
+                                                        default_recording_layout, default_custom_layout).render(
+                                     customSessionId=custom_session_id))
 
         if response.status_code == 200:
-            id = response.json()['id']
+            id = codec.loads(response.content)['id']
             self.logger.info('Created new session `%s`', id)
             return Session(self, id)
         elif response.status_code == 409:
@@ -895,17 +1202,74 @@ class Server:
         else:
             raise OpenViduException(response.status_code, response.content.decode('utf-8'))
 
-    @property
-    def get_sessions(self) -> List[Session]:
+    def iter_sessions(self, prefix: str = None, summary: bool = False) -> Iterator[Union[Session, 'SessionSummary']]:
+        """
+        Lazily iterate over the active sessions.
+
+        Bodies of up to 8 MiB are decoded at once with the current codec, which is faster. Larger bodies, and bodies of
+        unknown length, are parsed incrementally with the decoder of the standard library instead of the codec, so
+        only one session is held in memory at a time regardless of how many sessions are active on the server.
+
+        :param str prefix: Only yield sessions whose id starts with this prefix (e.g. a room name)
+        :param bool summary: Yield lightweight `SessionSummary` objects which only carry the id and counters instead of
+            full `Session` objects including all connections
+        :return: An iterator over the matching sessions
         """
-        Get a list of all active sessions
+        response = self._request('GET', '/api/sessions', endpoint='sessions', priority=PRIORITY_HOUSEKEEPING,
+                                 stream=True)
+
+        try:
+            if response.status_code != 200:
+                raise OpenViduException(response.status_code, response.content.decode('utf-8'))
+
+            length = response.headers.get('Content-Length')
+            if length is not None and int(length) <= _STREAM_THRESHOLD:
+                sessions = codec.loads(response.content)['content']
+            else:
+                sessions = _iter_json_array(response.iter_content(chunk_size=_STREAM_CHUNK_SIZE), 'content')
+
+            for session in sessions:
+                if prefix and not session['sessionId'].startswith(prefix):
+                    continue
+                if summary:
+                    yield SessionSummary(session)
+                else:
+                    yield Session(self, session['sessionId'], _data=session)
+        finally:
+            response.close()
+
+    def watch(self, prefix: str = None) -> ServerWatcher:
         """
-        response = requests.get('{}/api/sessions'.format(self.url),
-                                verify=self.verify,
-                                headers=self.request_headers
-                                )
+        Creates a watcher reporting changes of all active sessions. Call `ServerWatcher.poll_changes` periodically to
+        receive the events.
+
+        :param str prefix: Only watch sessions whose id starts with this prefix
+        """
+        return ServerWatcher(self, prefix=prefix)
+
+    def get_sessions(self, prefix: str = None, summary: bool = False) -> List[Union[Session, 'SessionSummary']]:
+        """
+        Get a list of all active sessions. See `iter_sessions` for the parameters.
+        """
+        return list(self.iter_sessions(prefix=prefix, summary=summary))
+
+    def get_recordings(self, session_id: str = None, status: str = None) -> List[Recording]:
+        """
+        Get a list of all recordings.
+
+        :param str session_id: Only return the recordings of this session
+        :param str status: Only return recordings with this status, e.g. `started`
+        """
+        recordings = self.single_flight.do(('recordings',), self._fetch_recordings,
+                                           timeout=_remaining_time('listing recordings'))
+        return [Recording(self, recording['id'], _data=recording) for recording in recordings
+                if (session_id is None or recording['sessionId'] == session_id)
+                and (status is None or recording['status'] == status)]
+
+    def _fetch_recordings(self) -> List[dict]:
+        response = self._request('GET', '/api/recordings', endpoint='recordings', priority=PRIORITY_HOUSEKEEPING)
 
         if response.status_code == 200:
-            return [Session(self, session['sessionId'], _data=session) for session in response.json()['content']]
+            return codec.loads(response.content)['items']
         else:
             raise OpenViduException(response.status_code, response.content.decode('utf-8'))
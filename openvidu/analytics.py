@@ -0,0 +1,309 @@
+"""
+Talk time, overlapping speech and turn-taking per speaker of a recorded session.
+
+Only `INDIVIDUAL` recordings contain the audio of every participant separately. OpenVidu stores them in a directory (or
+a zip archive of it) holding one file per stream and a `<recording id>.json` file describing the streams, including
+the `serverData` of the token each stream was published with. The bot sets it to the slurk user id, so the results are
+keyed by slurk user.
+
+The bot records `COMPOSED` by default, which mixes all participants into a single stream and cannot be analyzed per
+speaker. Sessions meant for analysis have to be recorded in `INDIVIDUAL` mode, e.g. by starting the bot with
+`--recording-output-mode INDIVIDUAL`.
+
+The audio of each stream is decoded with `ffmpeg` into a raw PCM file in a temporary directory, which is memory-mapped
+and processed with NumPy in fixed-size frames, and deleted before the next stream is decoded. Zip archives are
+extracted into the temporary directory as well. Decoding dominates the cost, the NumPy part takes a fraction of a
+second per hour of audio. Requires NumPy.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import zipfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('openvidu.analytics')
+
+SAMPLE_RATE = 16000
+"""Sample rate the audio is decoded with."""
+
+FRAME_DURATION = 0.02
+"""Number of seconds per frame of the activity masks."""
+
+_BLOCK_FRAMES = 1 << 16
+_FULL_SCALE = 32768.0 ** 2
+
+
+def decode(path: str, sample_rate: int = SAMPLE_RATE, directory: str = None) -> str:
+    """
+    Decodes the audio of a media file to mono signed 16 bit little-endian PCM, unless this was done already.
+
+    :param str path: Path of the media file
+    :param int sample_rate: Sample rate of the PCM file
+    :param str directory: Directory the PCM file is written to, the directory of the media file by default
+    :return: Path of the PCM file
+    """
+    name = '{}.{}.pcm'.format(os.path.splitext(os.path.basename(path))[0], sample_rate)
+    pcm = os.path.join(directory or os.path.dirname(path), name)
+    if os.path.exists(pcm) and os.path.getmtime(pcm) >= os.path.getmtime(path):
+        return pcm
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', path, '-vn', '-ac', '1',
+                    '-ar', str(sample_rate), '-f', 's16le', pcm], check=True)
+    return pcm
+
+
+def load_pcm(path: str) -> np.ndarray:
+    """
+    Memory-maps a PCM file created by `decode`.
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype='<i2')
+    return np.memmap(path, dtype='<i2', mode='r')
+
+
+def frame_energy(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    """
+    Computes the RMS energy of consecutive frames in dBFS. A trailing partial frame is dropped.
+
+    :param samples: 16 bit samples, e.g. returned by `load_pcm`
+    :param int frame_length: Number of samples per frame
+    :return: One value per frame
+    """
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length)
+    energy = np.empty(count, dtype=np.float32)
+    # Blocks bound the memory of the float conversion, the memory map is paged in as the blocks are processed
+    for start in range(0, count, _BLOCK_FRAMES):
+        block = frames[start:start + _BLOCK_FRAMES].astype(np.float32)
+        energy[start:start + len(block)] = np.einsum('ij,ij->i', block, block) / frame_length
+    return 10 * np.log10(energy / _FULL_SCALE + 1e-10)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(energy: np.ndarray, margin: float = 15, floor: float = -50, min_speech: int = 5,
+                min_silence: int = 15) -> np.ndarray:
+    """
+    Derives a speech activity mask from frame energies.
+
+    A frame is active if its energy exceeds both the noise level of the stream, estimated as the 10th percentile of the
+    energies, by `margin` dB, and the absolute `floor`. Pauses shorter than `min_silence` frames are bridged, and
+    bursts shorter than `min_speech` frames are dropped afterwards.
+
+    :param energy: Frame energies in dBFS, see `frame_energy`
+    :param float margin: dB above the noise level
+    :param float floor: Minimum energy of speech in dBFS
+    :param int min_speech: Minimum number of frames of speech
+    :param int min_silence: Minimum number of frames of a pause
+    :return: Boolean mask with one value per frame
+    """
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    threshold = max(float(np.percentile(energy, 10)) + margin, floor)
+    starts, ends = _runs(energy > threshold)
+
+    if len(starts):
+        keep = (starts[1:] - ends[:-1]) >= min_silence
+        starts, ends = starts[np.r_[True, keep]], ends[np.r_[keep, True]]
+        long = (ends - starts) >= min_speech
+        starts, ends = starts[long], ends[long]
+
+    delta = np.zeros(len(energy) + 1, dtype=np.int8)
+    delta[starts] = 1
+    delta[ends] = -1
+    return np.cumsum(delta[:-1]) > 0
+
+
+class SpeakerStats:
+    """
+    Speech statistics of a single speaker.
+    """
+    __slots__ = ('user', 'talk_time', 'overlap_time', 'turns')
+
+    def __init__(self, user: str, talk_time: float, overlap_time: float, turns: int):
+        self.user = user
+        self.talk_time = talk_time
+        self.overlap_time = overlap_time
+        self.turns = turns
+
+    def __repr__(self):
+        return str({
+            "user": self.user,
+            "talk_time": self.talk_time,
+            "overlap_time": self.overlap_time,
+            "overlap_ratio": self.overlap_ratio,
+            "turns": self.turns,
+        })
+
+    @property
+    def overlap_ratio(self) -> float:
+        """
+        Get the share of the talk time during which someone else was speaking as well.
+        """
+        return self.overlap_time / self.talk_time if self.talk_time else 0.0
+
+
+class SessionStats:
+    """
+    Speech statistics of a recorded session.
+    """
+    def __init__(self, recording_id: str, session_id: str, duration: float, speech_time: float,
+                 overlap_time: float, speakers: List[SpeakerStats]):
+        self.recording_id = recording_id
+        self.session_id = session_id
+        self.duration = duration
+        self.speech_time = speech_time
+        self.overlap_time = overlap_time
+        self.speakers = speakers
+
+    def __repr__(self):
+        return str({
+            "recording_id": self.recording_id,
+            "session_id": self.session_id,
+            "duration": self.duration,
+            "speech_time": self.speech_time,
+            "overlap_ratio": self.overlap_ratio,
+            "speakers": self.speakers,
+        })
+
+    @property
+    def overlap_ratio(self) -> float:
+        """
+        Get the share of the time with speech during which several speakers were speaking.
+        """
+        return self.overlap_time / self.speech_time if self.speech_time else 0.0
+
+
+def analyze_masks(masks: Dict[str, Tuple[int, np.ndarray]], frame_duration: float = FRAME_DURATION) \
+        -> Tuple[float, float, float, List[SpeakerStats]]:
+    """
+    Computes the statistics of aligned speech activity masks.
+
+    A turn starts whenever a speaker takes the floor, i.e. is the only one speaking, after someone else held it.
+
+    :param dict masks: Maps every speaker to the frame offset of its mask and the mask
+    :param float frame_duration: Number of seconds per frame
+    :return: Duration, time with speech, time with overlapping speech, and the statistics per speaker
+    """
+    users = list(masks)
+    length = max((offset + len(mask) for offset, mask in masks.values()), default=0)
+    active = np.zeros((len(users), length), dtype=bool)
+    for row, user in enumerate(users):
+        offset, mask = masks[user]
+        active[row, offset:offset + len(mask)] |= mask
+
+    speaking = active.sum(axis=0)
+    overlapping = speaking > 1
+    single = speaking == 1
+    holders = active[:, single].argmax(axis=0)
+    turns = np.bincount(holders[np.r_[True, holders[1:] != holders[:-1]]] if len(holders) else holders,
+                        minlength=len(users))
+
+    talk = active.sum(axis=1)
+    overlap = (active & overlapping).sum(axis=1)
+    speakers = [SpeakerStats(user, float(talk[row]) * frame_duration, float(overlap[row]) * frame_duration,
+                             int(turns[row]))
+                for row, user in enumerate(users)]
+    return (length * frame_duration, float(np.count_nonzero(speaking)) * frame_duration,
+            float(np.count_nonzero(overlapping)) * frame_duration, speakers)
+
+
+def _recording_dir(path: str, scratch: str) -> str:
+    if not zipfile.is_zipfile(path):
+        return path
+    directory = os.path.join(scratch, 'recording')
+    with zipfile.ZipFile(path) as archive:
+        archive.extractall(directory)
+    return directory
+
+
+def _metadata(directory: str) -> dict:
+    candidates = [name for name in os.listdir(directory) if name.endswith('.json')]
+    for name in candidates:
+        with open(os.path.join(directory, name)) as file:
+            metadata = json.load(file)
+        if 'files' in metadata:
+            return metadata
+    raise FileNotFoundError('No recording metadata in `{}`'.format(directory))
+
+
+def _stream_masks(directory: str, metadata: dict, scratch: str, sample_rate: int, frame_length: int,
+                  frame_duration: float, mask_options: dict) -> Dict[str, Tuple[int, np.ndarray]]:
+    masks = {}
+    for stream in metadata['files']:
+        if not stream.get('hasAudio', True):
+            continue
+        name = stream.get('name') or '{}.webm'.format(stream['streamId'])
+        user = stream.get('serverData') or stream.get('connectionId') or name
+        pcm = decode(os.path.join(directory, name), sample_rate, scratch)
+        try:
+            mask = speech_mask(frame_energy(load_pcm(pcm), frame_length), **mask_options)
+        finally:
+            # Only the PCM of a single stream is kept on disk at a time
+            os.remove(pcm)
+        offset = int(round(stream.get('startTimeOffset', 0) / 1000 / frame_duration))
+
+        if user in masks:
+            previous_offset, previous = masks[user]
+            start = min(offset, previous_offset)
+            merged = np.zeros(max(offset + len(mask), previous_offset + len(previous)) - start, dtype=bool)
+            merged[previous_offset - start:previous_offset - start + len(previous)] = previous
+            merged[offset - start:offset - start + len(mask)] |= mask
+            masks[user] = (start, merged)
+        else:
+            masks[user] = (offset, mask)
+    return masks
+
+
+def analyze_recording(path: str, sample_rate: int = SAMPLE_RATE, frame_duration: float = FRAME_DURATION,
+                      **mask_options) -> SessionStats:
+    """
+    Computes the speech statistics of an `INDIVIDUAL` recording. Several streams of the same user, e.g. after a
+    reconnect, are merged. Only temporary files are written, and they are removed before returning.
+
+    :param str path: Directory or zip archive of the recording
+    :param int sample_rate: Sample rate the audio is analyzed with
+    :param float frame_duration: Number of seconds per frame
+    :param mask_options: Additional parameters of `speech_mask`
+    :return: The statistics
+    """
+    frame_length = int(sample_rate * frame_duration)
+    with tempfile.TemporaryDirectory(prefix='openvidu-analytics-') as scratch:
+        directory = _recording_dir(path, scratch)
+        metadata = _metadata(directory)
+        masks = _stream_masks(directory, metadata, scratch, sample_rate, frame_length, frame_duration, mask_options)
+
+    duration, speech_time, overlap_time, speakers = analyze_masks(masks, frame_duration)
+    return SessionStats(metadata.get('id'), metadata.get('sessionId'), duration, speech_time, overlap_time, speakers)
+
+
+def main(args: List[str] = None):
+    parser = argparse.ArgumentParser(description='Compute talk time, overlap and turns per speaker of INDIVIDUAL '
+                                                 'OpenVidu recordings')
+    parser.add_argument('recordings', nargs='+', help='Directories or zip archives of the recordings')
+    parser.add_argument('--sample-rate', type=int, default=SAMPLE_RATE, help='Sample rate the audio is analyzed with')
+    args = parser.parse_args(args)
+
+    print('\t'.join(['recording', 'session', 'user', 'talk_seconds', 'overlap_seconds', 'overlap_ratio', 'turns']))
+    for path in args.recordings:
+        try:
+            stats = analyze_recording(path, args.sample_rate)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            logger.error('Could not analyze `%s`: %s', path, e)
+            continue
+        for speaker in stats.speakers:
+            print('\t'.join([str(stats.recording_id), str(stats.session_id), speaker.user,
+                             '{:.2f}'.format(speaker.talk_time), '{:.2f}'.format(speaker.overlap_time),
+                             '{:.3f}'.format(speaker.overlap_ratio), str(speaker.turns)]))
+
+
+if __name__ == '__main__':
+    main()
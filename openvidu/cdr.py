@@ -0,0 +1,283 @@
+"""
+Incremental ingestion of OpenVidu Call Detail Records (CDR).
+
+OpenVidu writes one JSON object per line to its CDR file (`openvidu.cdr.path`, `/opt/openvidu/cdr` by default) if
+`openvidu.cdr` is enabled, see `Server.cdr`. Each object maps the event name to its properties, e.g.
+`{"participantLeft": {"sessionId": "...", "timestamp": ..., "duration": 42, "reason": "disconnect"}}`.
+"""
+
+import argparse
+import json
+import logging
+import os
+from array import array
+from time import sleep
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('openvidu.cdr')
+
+FAILURE_REASONS = {'networkDisconnect', 'mediaServerDisconnect', 'openviduServerStopped'}
+"""Reasons of `participantLeft` and `recordingStopped` events which are counted as failures."""
+
+
+class CdrReader:
+    """
+    Reads the events appended to a CDR file since the last read. Only complete lines are consumed, so a line which is
+    still being written is picked up by the next read. If the file was truncated, or replaced by a new file with a
+    different inode, reading restarts at the beginning. Events appended to a rotated file after the last read are lost.
+    """
+    def __init__(self, path: str, offset: int = 0, inode: int = None):
+        """
+        :param str path: Path of the CDR file
+        :param int offset: Byte offset to continue reading at
+        :param int inode: Inode of the file `offset` refers to. If omitted, `offset` is assumed to refer to the
+            current file.
+        """
+        self.path = path
+        self.offset = offset
+        self.inode = inode
+
+    def read(self) -> Iterator[Tuple[str, dict]]:
+        """
+        Yields the new events as tuples of event name and properties. `offset` is advanced past every yielded event.
+        """
+        try:
+            file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+
+        with file:
+            # The opened file is inspected, so a rotation in between cannot be missed
+            stat = os.fstat(file.fileno())
+            if self.inode is not None and stat.st_ino != self.inode:
+                logger.info('CDR file `%s` was rotated, reading from the beginning', self.path)
+                self.offset = 0
+            elif stat.st_size < self.offset:
+                logger.info('CDR file `%s` was truncated, reading from the beginning', self.path)
+                self.offset = 0
+            self.inode = stat.st_ino
+
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                start = self.offset
+                self.offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning('Skipping malformed CDR line at offset %d', start)
+                    continue
+                for event, properties in record.items():
+                    yield event, properties
+
+    def follow(self, interval: float = 1) -> Iterator[Tuple[str, dict]]:
+        """
+        Yields new events forever, polling the file every `interval` seconds.
+        """
+        while True:
+            yield from self.read()
+            sleep(interval)
+
+
+class CdrSummary:
+    """
+    Per-room aggregates of CDR events, stored column-wise in `array`s with one row per room.
+
+    A single incident, e.g. a media server crash, ends every stream, participant, recording and the session itself,
+    and each of these events carries the failure reason. Failures are therefore only counted once per participant on
+    `participantLeft` and once per recording on `recordingStopped`, in separate columns.
+    """
+    COLUMNS = {
+        'sessions': 'l',
+        'session_seconds': 'd',
+        'participants': 'l',
+        'participant_minutes': 'd',
+        'recordings': 'l',
+        'recording_seconds': 'd',
+        'participant_failures': 'l',
+        'recording_failures': 'l',
+    }
+
+    def __init__(self):
+        self.rooms = []
+        self._rows = {}
+        self.columns = {name: array(typecode) for name, typecode in self.COLUMNS.items()}
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def _row(self, room: str) -> int:
+        row = self._rows.get(room)
+        if row is None:
+            row = self._rows[room] = len(self.rooms)
+            self.rooms.append(room)
+            for column in self.columns.values():
+                column.append(0)
+        return row
+
+    def add(self, event: str, properties: dict):
+        """
+        Aggregates a single event. Durations are reported by OpenVidu in seconds when a session, participant or
+        recording ends.
+
+        :param str event: Name of the event
+        :param dict properties: Properties of the event
+        """
+        room = properties.get('sessionId')
+        if room is None:
+            return
+        row = self._row(room)
+        columns = self.columns
+
+        if event == 'sessionCreated':
+            columns['sessions'][row] += 1
+        elif event == 'sessionDestroyed':
+            columns['session_seconds'][row] += properties.get('duration', 0)
+        elif event == 'participantJoined':
+            columns['participants'][row] += 1
+        elif event == 'participantLeft':
+            columns['participant_minutes'][row] += properties.get('duration', 0) / 60
+            if properties.get('reason') in FAILURE_REASONS:
+                columns['participant_failures'][row] += 1
+        elif event == 'recordingStarted':
+            columns['recordings'][row] += 1
+        elif event == 'recordingStopped':
+            columns['recording_seconds'][row] += properties.get('duration', 0)
+            if properties.get('reason') in FAILURE_REASONS:
+                columns['recording_failures'][row] += 1
+
+    def update(self, events: Iterable[Tuple[str, dict]]):
+        """
+        Aggregates several events.
+        """
+        for event, properties in events:
+            self.add(event, properties)
+
+    def row(self, room: str) -> Optional[dict]:
+        """
+        Get the aggregates of a room, or `None` if no event of the room was seen.
+        """
+        row = self._rows.get(room)
+        if row is None:
+            return None
+        return {name: column[row] for name, column in self.columns.items()}
+
+    def totals(self) -> dict:
+        """
+        Get the aggregates summed over all rooms.
+        """
+        return {name: sum(column) for name, column in self.columns.items()}
+
+    def to_dict(self) -> dict:
+        """
+        Get a JSON-serializable representation of the summary.
+        """
+        return {"rooms": self.rooms, "columns": {name: column.tolist() for name, column in self.columns.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CdrSummary':
+        """
+        Restores a summary created by `to_dict`.
+        """
+        summary = cls()
+        summary.rooms = list(data['rooms'])
+        summary._rows = {room: row for row, room in enumerate(summary.rooms)}
+        for name, typecode in cls.COLUMNS.items():
+            summary.columns[name] = array(typecode, data['columns'].get(name, [0] * len(summary.rooms)))
+        return summary
+
+
+class CdrIngestor:
+    """
+    Tails a CDR file into a `CdrSummary`. The read offset, the inode of the file and the summary are persisted
+    together, so events are neither lost nor counted twice across restarts, and a file rotated in between is read from
+    the beginning.
+    """
+    def __init__(self, path: str, state_path: str = None):
+        """
+        :param str path: Path of the CDR file, local or on a mounted volume
+        :param str state_path: Path of the file storing the offset and the summary. If omitted, nothing is persisted.
+        """
+        self.state_path = state_path
+        self.summary = CdrSummary()
+        offset = 0
+        inode = None
+
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as file:
+                state = json.load(file)
+            offset = state['offset']
+            inode = state.get('inode')
+            self.summary = CdrSummary.from_dict(state['summary'])
+
+        self.reader = CdrReader(path, offset, inode)
+
+    def poll(self) -> int:
+        """
+        Ingests the events appended since the last poll and persists the state.
+
+        :return: The number of ingested events
+        """
+        count = 0
+        for event, properties in self.reader.read():
+            self.summary.add(event, properties)
+            count += 1
+        if count:
+            self.save()
+        return count
+
+    def save(self):
+        """
+        Atomically writes the offset, the inode and the summary to `state_path`.
+        """
+        if not self.state_path:
+            return
+        temporary = self.state_path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({"offset": self.reader.offset, "inode": self.reader.inode, "summary": self.summary.to_dict()},
+                      file)
+        os.replace(temporary, self.state_path)
+
+    def run(self, interval: float = 5):
+        """
+        Polls the CDR file forever.
+
+        :param float interval: Number of seconds between two polls
+        """
+        while True:
+            self.poll()
+            sleep(interval)
+
+
+def _print_summary(summary: CdrSummary):
+    columns = list(CdrSummary.COLUMNS)
+    print('\t'.join(['room'] + columns))
+    for room in summary.rooms:
+        row = summary.row(room)
+        print('\t'.join([room] + [str(row[column]) for column in columns]))
+    print(flush=True)
+
+
+def main(args: List[str] = None):
+    parser = argparse.ArgumentParser(description='Summarize OpenVidu CDR files per room')
+    parser.add_argument('path', help='Path of the CDR file')
+    parser.add_argument('--state', help='File to persist the read offset and the summary in')
+    parser.add_argument('--follow', type=float, metavar='SECONDS',
+                        help='Keep polling the file at this interval and print the summary whenever it changed')
+    args = parser.parse_args(args)
+
+    ingestor = CdrIngestor(args.path, args.state)
+    ingestor.poll()
+    _print_summary(ingestor.summary)
+    while args.follow:
+        sleep(args.follow)
+        if ingestor.poll():
+            _print_summary(ingestor.summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+JSON encoding and decoding of API bodies.
+
+The fastest available JSON library is used: `orjson` or `ujson` if installed, the standard library otherwise. Another
+codec can be selected with `set_codec`, e.g. to compare implementations.
+"""
+
+import json
+from typing import Callable, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec:
+    """
+    A pair of JSON functions operating on bytes.
+    """
+    def __init__(self, name: str, dumps: Callable[[object], bytes], loads: Callable[[Union[bytes, str]], object]):
+        """
+        :param str name: Name of the implementation
+        :param dumps: Encodes an object to UTF-8 encoded JSON
+        :param loads: Decodes JSON from bytes or a string
+        """
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self):
+        return 'JsonCodec({})'.format(self.name)
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+CODECS = {
+    'json': JsonCodec('json', _stdlib_dumps, json.loads),
+}
+if ujson is not None:
+    CODECS['ujson'] = JsonCodec('ujson', lambda obj: ujson.dumps(obj).encode('utf-8'), ujson.loads)
+if orjson is not None:
+    CODECS['orjson'] = JsonCodec('orjson', orjson.dumps, orjson.loads)
+
+_codec = CODECS.get('orjson') or CODECS.get('ujson') or CODECS['json']
+
+
+def get_codec() -> JsonCodec:
+    """
+    Get the codec currently used for API bodies.
+    """
+    return _codec
+
+
+def set_codec(codec: Union[str, JsonCodec]):
+    """
+    Selects the codec used for API bodies.
+
+    :param codec: A `JsonCodec`, or the name of one of the available `CODECS`
+    """
+    global _codec
+    _codec = CODECS[codec] if isinstance(codec, str) else codec
+
+
+def dumps(obj) -> bytes:
+    """
+    Encodes an object to UTF-8 encoded JSON with the current codec.
+    """
+    return _codec.dumps(obj)
+
+
+def loads(data: Union[bytes, str]):
+    """
+    Decodes JSON with the current codec. Raises a `ValueError` if `data` is not valid JSON.
+    """
+    return _codec.loads(data)
+
+
+class BodyTemplate:
+    """
+    A JSON object body whose constant fields are encoded once. Rendering only encodes the variable fields and
+    concatenates them with the pre-encoded fragment.
+    """
+    def __init__(self, constant: Dict[str, object]):
+        """
+        :param dict constant: The fields which are the same for every request
+        """
+        self.constant = dict(constant)
+        self._fragment = dumps(self.constant)[1:-1]
+
+    def render(self, **fields) -> bytes:
+        """
+        Encodes a body consisting of the constant and the given fields. The given fields must not repeat constant ones.
+        """
+        if not fields:
+            return b'{' + self._fragment + b'}'
+        variable = dumps(fields)[1:-1]
+        if not self._fragment:
+            return b'{' + variable + b'}'
+        return b'{' + variable + b',' + self._fragment + b'}'
@@ -0,0 +1,168 @@
+"""
+Change events computed by diffing successive snapshots of OpenVidu sessions.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class SessionSnapshot:
+    """
+    Minimal state of a session used to compute changes. Only identifiers are kept, so snapshots stay small even for
+    sessions with many connections.
+    """
+    __slots__ = ('session_id', 'recording', 'connections')
+
+    def __init__(self, session_id: str, recording: bool, connections: Dict[str, Tuple[str, ...]]):
+        """
+        :param str session_id: Identifier of the session
+        :param bool recording: Whether the session is being recorded
+        :param dict connections: Mapping from connection id to the ids of the streams it publishes
+        """
+        self.session_id = session_id
+        self.recording = recording
+        self.connections = connections
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'SessionSnapshot':
+        """
+        Creates a snapshot from the session data returned by the server.
+
+        :param dict data: Dictionary of data as returned by `GET /api/sessions/<id>`
+        """
+        connections = {}
+        for connection in data['connections']['content']:
+            connections[connection['connectionId']] = tuple(
+                publisher['streamId'] for publisher in connection.get('publishers') or ()
+            )
+        return cls(data['sessionId'], data['recording'], connections)
+
+
+class SessionEvent:
+    """
+    Base class of all events emitted when diffing sessions.
+    """
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+    def _fields(self) -> dict:
+        return {"session_id": self.session_id}
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self._fields())
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._fields() == other._fields()
+
+
+class ConnectionAdded(SessionEvent):
+    """
+    A new connection joined the session.
+    """
+    def __init__(self, session_id: str, connection_id: str):
+        super().__init__(session_id)
+        self.connection_id = connection_id
+
+    def _fields(self) -> dict:
+        return {"session_id": self.session_id, "connection_id": self.connection_id}
+
+
+class ConnectionRemoved(SessionEvent):
+    """
+    A connection left the session.
+    """
+    def __init__(self, session_id: str, connection_id: str):
+        super().__init__(session_id)
+        self.connection_id = connection_id
+
+    def _fields(self) -> dict:
+        return {"session_id": self.session_id, "connection_id": self.connection_id}
+
+
+class PublisherStarted(SessionEvent):
+    """
+    A connection started publishing a stream.
+    """
+    def __init__(self, session_id: str, connection_id: str, stream_id: str):
+        super().__init__(session_id)
+        self.connection_id = connection_id
+        self.stream_id = stream_id
+
+    def _fields(self) -> dict:
+        return {"session_id": self.session_id, "connection_id": self.connection_id, "stream_id": self.stream_id}
+
+
+class RecordingToggled(SessionEvent):
+    """
+    The recording of the session was started or stopped.
+    """
+    def __init__(self, session_id: str, recording: bool):
+        super().__init__(session_id)
+        self.recording = recording
+
+    def _fields(self) -> dict:
+        return {"session_id": self.session_id, "recording": self.recording}
+
+
+class SessionClosed(SessionEvent):
+    """
+    The session is no longer active on the server. Only emitted by `ServerWatcher`.
+    """
+
+
+def diff_snapshots(old: Optional[SessionSnapshot], new: SessionSnapshot) -> Iterator[SessionEvent]:
+    """
+    Computes the events leading from `old` to `new`. Connections are compared by their id only.
+
+    :param old: The previous snapshot or `None` if the session was not known before
+    :param new: The current snapshot
+    :return: An iterator over the events
+    """
+    session_id = new.session_id
+    old_connections = old.connections if old else {}
+
+    for connection_id in old_connections.keys() - new.connections.keys():
+        yield ConnectionRemoved(session_id, connection_id)
+
+    for connection_id, streams in new.connections.items():
+        previous = old_connections.get(connection_id)
+        if previous is None:
+            yield ConnectionAdded(session_id, connection_id)
+            previous = ()
+        for stream_id in streams:
+            if stream_id not in previous:
+                yield PublisherStarted(session_id, connection_id, stream_id)
+
+    if (old.recording if old else False) != new.recording:
+        yield RecordingToggled(session_id, new.recording)
+
+
+class ServerWatcher:
+    """
+    Watches all sessions of a server and reports the changes between two calls of `poll_changes`.
+    """
+    def __init__(self, server, prefix: str = None):
+        """
+        :param Server server: OpenVidu server
+        :param str prefix: Only watch sessions whose id starts with this prefix
+        """
+        self.server = server
+        self.prefix = prefix
+        self._snapshots = {}
+
+    def poll_changes(self) -> List[SessionEvent]:
+        """
+        Fetches the active sessions and returns the events since the last call. Sessions seen for the first time
+        report all of their connections as added.
+        """
+        events = []
+        snapshots = {}
+        for session in self.server.iter_sessions(prefix=self.prefix):
+            snapshot = SessionSnapshot.from_data(session._data)
+            events.extend(diff_snapshots(self._snapshots.get(snapshot.session_id), snapshot))
+            snapshots[snapshot.session_id] = snapshot
+
+        for session_id in self._snapshots.keys() - snapshots.keys():
+            events.append(SessionClosed(session_id))
+
+        self._snapshots = snapshots
+        return events
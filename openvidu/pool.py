@@ -0,0 +1,205 @@
+"""
+Placement of sessions across several OpenVidu media nodes.
+"""
+
+import logging
+import threading
+from time import monotonic
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+
+
+def _errors():
+    from . import OpenViduException
+    return OpenViduException, requests.RequestException, ValueError
+
+
+class ServerPool:
+    """
+    A pool of OpenVidu servers. New sessions are placed on the least loaded server and every session stays on the
+    server it was created on, so tokens and recordings of a session are always requested from the right node.
+
+    The pool offers the same session API as `Server`, so it can be used as a drop-in replacement.
+
+    A server which cannot be reached is skipped: no new sessions are placed on it until a later `refresh_load`
+    succeeds. Servers given as URL and secret which cannot be reached at creation are retried on every refresh.
+    """
+    def __init__(self, servers: Sequence[Union['Server', Tuple[str, str]]], verify=True, refresh_interval: float = 10,
+                 **server_kwargs):
+        """
+        Creates a pool from a list of servers.
+
+        :param servers: Either `Server` instances or tuples of URL and secret
+        :param bool verify: Verify certificates for servers created from URL and secret
+        :param float refresh_interval: Number of seconds the load reported by the servers is cached. In between, the
+            load is estimated from the sessions placed by this pool.
+        :param server_kwargs: Additional parameters passed to `Server` for servers created from URL and secret, e.g. the
+            rate and concurrency limits
+        """
+        if not servers:
+            raise ValueError('A server pool requires at least one server')
+
+        self.verify = verify
+        self.server_kwargs = server_kwargs
+        self.servers = []
+        self.refresh_interval = refresh_interval
+        self._pending = []
+        self._unhealthy = set()
+        self._affinity = {}
+        self._load = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+        error = None
+        for server in servers:
+            try:
+                self._add(server)
+            except _errors() as e:
+                self.logger.warning('OpenVidu server `%s` is unavailable: %s', server[0], e)
+                self._pending.append(server)
+                error = e
+        if not self.servers:
+            raise error
+
+    def _add(self, server: Union['Server', Tuple[str, str]]):
+        from . import Server
+        if not isinstance(server, Server):
+            server = Server(server[0], server[1], verify=self.verify, **self.server_kwargs)
+        self.servers.append(server)
+        self._load[server.url] = 0
+
+    def __repr__(self):
+        return str({
+            "servers": [server.url for server in self.servers],
+            "load": self.load,
+        })
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the ServerPool class.
+        """
+        return logging.getLogger('openvidu.ServerPool')
+
+    @property
+    def healthy(self) -> List['Server']:
+        """
+        Get the servers which answered the last refresh.
+        """
+        return [server for server in self.servers if server.url not in self._unhealthy]
+
+    @property
+    def load(self) -> Dict[str, int]:
+        """
+        Get the last known load per server URL, measured as number of sessions plus number of connections.
+        """
+        return dict(self._load)
+
+    def refresh_load(self):
+        """
+        Queries the active sessions of every server to update the load and the session affinity. Servers which fail
+        to answer are marked unhealthy and keep their last known sessions.
+        """
+        for server in list(self._pending):
+            try:
+                self._add(server)
+                self._pending.remove(server)
+                self.logger.info('OpenVidu server `%s` is available', server[0])
+            except _errors() as e:
+                self.logger.debug('OpenVidu server `%s` is still unavailable: %s', server[0], e)
+
+        load = {}
+        affinity = {}
+        unhealthy = set()
+        for server in self.servers:
+            sessions = {}
+            try:
+                load[server.url] = 0
+                for session in server.iter_sessions(summary=True):
+                    load[server.url] += 1 + session.number_of_connections
+                    sessions[session.id] = server
+            except _errors() as e:
+                self.logger.warning('Could not query OpenVidu server `%s`: %s', server.url, e)
+                unhealthy.add(server.url)
+                load[server.url] = self._load.get(server.url, 0)
+                sessions = {session_id: known for session_id, known in self._affinity.items() if known is server}
+            affinity.update(sessions)
+
+        with self._lock:
+            self._load = load
+            self._affinity = affinity
+            self._unhealthy = unhealthy
+            self._refreshed_at = monotonic()
+
+    def server_for(self, session_id: str) -> Optional['Server']:
+        """
+        Get the server hosting the session, or `None` if the session is not known to the pool.
+
+        :param str session_id: Identifier of the session
+        """
+        with self._lock:
+            return self._affinity.get(session_id)
+
+    def least_loaded(self) -> 'Server':
+        """
+        Get the healthy server with the lowest load.
+        """
+        from . import OpenViduException
+        if self._refreshed_at is None or monotonic() - self._refreshed_at > self.refresh_interval:
+            self.refresh_load()
+        healthy = self.healthy
+        if not healthy:
+            raise OpenViduException(503, 'No OpenVidu server is available')
+        return min(healthy, key=lambda server: self._load[server.url])
+
+    def initialize_session(self, custom_session_id: str = None, **kwargs) -> 'Session':
+        """
+        Initializes a new session on the least loaded server. If a session with `custom_session_id` already exists in
+        the pool, it is initialized on the same server. See `Server.initialize_session` for the parameters.
+
+        :return: the session
+        """
+        server = self.server_for(custom_session_id) if custom_session_id else None
+        if server is None:
+            if custom_session_id and self._refreshed_at is None:
+                self.refresh_load()
+                server = self.server_for(custom_session_id)
+            if server is None:
+                server = self.least_loaded()
+
+        session = server.initialize_session(custom_session_id=custom_session_id, **kwargs)
+        with self._lock:
+            if session.id not in self._affinity:
+                self._load[server.url] += 1
+            self._affinity[session.id] = server
+        self.logger.debug('Placed session `%s` on `%s`', session.id, server.url)
+        return session
+
+    def release(self, session_id: str):
+        """
+        Forgets the placement of a closed session.
+
+        :param str session_id: Identifier of the session
+        """
+        with self._lock:
+            server = self._affinity.pop(session_id, None)
+            if server is not None and self._load[server.url] > 0:
+                self._load[server.url] -= 1
+
+    def iter_sessions(self, prefix: str = None, summary: bool = False) -> Iterator[Union['Session', 'SessionSummary']]:
+        """
+        Lazily iterate over the active sessions of all servers. Servers which fail to answer are skipped. See
+        `Server.iter_sessions` for the parameters.
+        """
+        for server in self.servers:
+            try:
+                yield from server.iter_sessions(prefix=prefix, summary=summary)
+            except _errors() as e:
+                self.logger.warning('Could not list the sessions of OpenVidu server `%s`: %s', server.url, e)
+
+    def get_sessions(self, prefix: str = None, summary: bool = False) -> List[Union['Session', 'SessionSummary']]:
+        """
+        Get a list of all active sessions of all servers. See `Server.iter_sessions` for the parameters.
+        """
+        return list(self.iter_sessions(prefix=prefix, summary=summary))
@@ -0,0 +1,208 @@
+"""
+Admission control for API calls to an OpenVidu server.
+"""
+
+import itertools
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Dict, Optional
+
+import requests
+
+PRIORITY_TOKEN = 0
+"""Token minting and everything required for it, e.g. creating the session."""
+
+PRIORITY_RECORDING = 1
+"""Starting and stopping recordings."""
+
+PRIORITY_HOUSEKEEPING = 2
+"""Listing, closing and cleaning up sessions."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket. Tokens are refilled continuously at `rate` per second up to `burst`.
+    """
+    def __init__(self, rate: float, burst: int = None):
+        """
+        :param float rate: Number of tokens added per second
+        :param int burst: Maximum number of tokens in the bucket. Defaults to `rate`, but at least one.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated_at = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def delay(self) -> float:
+        """
+        Get the number of seconds until a token is available. Not thread-safe, guard with a lock.
+        """
+        self._refill()
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def take(self):
+        """
+        Removes a token from the bucket. Only call if `delay` returned 0.
+        """
+        self._tokens -= 1
+
+
+class AdmissionController:
+    """
+    Limits the rate and the per-endpoint concurrency of API calls. Calls waiting for admission are served by priority
+    (lower values first) and in arrival order within a priority. A waiting call never blocks calls to other endpoints.
+    """
+    def __init__(self, rate: float = None, burst: int = None, concurrency: Dict[str, int] = None,
+                 default_concurrency: int = None):
+        """
+        :param float rate: Maximum number of calls per second, or `None` for no limit
+        :param int burst: Number of calls which may exceed `rate` in a burst
+        :param dict concurrency: Maximum number of calls in flight per endpoint
+        :param int default_concurrency: Maximum number of calls in flight for endpoints not listed in `concurrency`, or
+            `None` for no limit
+        """
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._concurrency = dict(concurrency or {})
+        self._default_concurrency = default_concurrency
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._in_flight = {}
+
+        self.admitted = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Get whether any limit is configured.
+        """
+        return self._bucket is not None or bool(self._concurrency) or self._default_concurrency is not None
+
+    @property
+    def queue_depth(self) -> Dict[int, int]:
+        """
+        Get the number of calls waiting for admission per priority.
+        """
+        with self._condition:
+            depth = {}
+            for priority, _, _ in self._waiting:
+                depth[priority] = depth.get(priority, 0) + 1
+            return depth
+
+    @property
+    def in_flight(self) -> Dict[str, int]:
+        """
+        Get the number of calls in flight per endpoint.
+        """
+        with self._condition:
+            return {endpoint: count for endpoint, count in self._in_flight.items() if count}
+
+    @property
+    def metrics(self) -> dict:
+        """
+        Get a snapshot of the admission metrics.
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "average_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+        }
+
+    def _limit(self, endpoint: str) -> Optional[int]:
+        return self._concurrency.get(endpoint, self._default_concurrency)
+
+    def _has_capacity(self, endpoint: str) -> bool:
+        limit = self._limit(endpoint)
+        return limit is None or self._in_flight.get(endpoint, 0) < limit
+
+    def _next_admissible(self):
+        for entry in sorted(self._waiting):
+            if self._has_capacity(entry[2]):
+                return entry
+        return None
+
+    def acquire(self, endpoint: str, priority: int = PRIORITY_HOUSEKEEPING, timeout: float = None):
+        """
+        Blocks until a call to `endpoint` is admitted. Every call to `acquire` must be followed by `release`.
+
+        :param str endpoint: Name of the endpoint
+        :param int priority: Priority class of the call
+        :param float timeout: Maximum number of seconds to wait for admission, or `None` to wait indefinitely
+        :raises requests.Timeout: If the call was not admitted within `timeout`
+        """
+        if not self.enabled:
+            return
+
+        started_at = monotonic()
+        expires_at = started_at + timeout if timeout is not None else None
+        entry = (priority, next(self._sequence), endpoint)
+        with self._condition:
+            self._waiting.append(entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            try:
+                while True:
+                    wait = None
+                    if self._next_admissible() is entry:
+                        delay = self._bucket.delay() if self._bucket else 0
+                        if delay == 0:
+                            break
+                        wait = delay
+                    if expires_at is not None:
+                        remaining = expires_at - monotonic()
+                        if remaining <= 0:
+                            raise requests.Timeout('Call to `{}` not admitted within {:.3g} seconds'.format(
+                                endpoint, timeout))
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            except BaseException:
+                self._waiting.remove(entry)
+                self._condition.notify_all()
+                raise
+
+            self._waiting.remove(entry)
+            if self._bucket:
+                self._bucket.take()
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+            self.admitted += 1
+            self.total_wait += monotonic() - started_at
+            self._condition.notify_all()
+
+    def release(self, endpoint: str):
+        """
+        Marks a call to `endpoint` as finished.
+
+        :param str endpoint: Name of the endpoint
+        """
+        if not self.enabled:
+            return
+
+        with self._condition:
+            self._in_flight[endpoint] -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, endpoint: str, priority: int = PRIORITY_HOUSEKEEPING, timeout: float = None):
+        """
+        Context manager wrapping `acquire` and `release`.
+
+        :param str endpoint: Name of the endpoint
+        :param int priority: Priority class of the call
+        :param float timeout: Maximum number of seconds to wait for admission, or `None` to wait indefinitely
+        """
+        self.acquire(endpoint, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(endpoint)
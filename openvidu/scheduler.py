@@ -0,0 +1,235 @@
+"""
+Scheduling of recordings within the capacity of the media nodes.
+"""
+
+import logging
+import threading
+from collections import deque
+from time import monotonic
+from typing import Callable, Optional
+
+import requests
+
+logger = logging.getLogger('openvidu.scheduler')
+
+
+class _Request:
+    __slots__ = ('session', 'kwargs', 'enqueued_at', 'timer')
+
+    def __init__(self, session, kwargs: dict):
+        self.session = session
+        self.kwargs = kwargs
+        self.enqueued_at = monotonic()
+        self.timer = None
+
+
+class RecordingScheduler:
+    """
+    Limits the number of concurrent `COMPOSED` recordings per media node.
+
+    Every `COMPOSED` recording runs its own recording process on the node. Once a node reached `max_composed`
+    recordings, further requests wait for a recording of the node to be released. A request which waited for
+    `max_wait` seconds, or whose `COMPOSED` recording failed on the node, is recorded in `INDIVIDUAL` mode instead,
+    which stores the stream of every participant without mixing them on the node. Requests for `INDIVIDUAL` recordings
+    are started right away.
+    """
+    def __init__(self, max_composed: int = 4, max_wait: Optional[float] = 30,
+                 on_started: Callable = None, on_failure: Callable = None):
+        """
+        :param int max_composed: Maximum number of concurrent `COMPOSED` recordings per node
+        :param float max_wait: Number of seconds a request waits for a `COMPOSED` recording before falling back to
+            `INDIVIDUAL` mode. With `None`, requests wait until capacity is available and never fall back.
+        :param on_started: Called with the session and the `Recording` once a recording was started
+        :param on_failure: Called with the session and the exception if no recording could be started
+        """
+        self.max_composed = max_composed
+        self.max_wait = max_wait
+        self.on_started = on_started
+        self.on_failure = on_failure
+
+        self._active = {}
+        self._holders = {}
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+        self.started = {'COMPOSED': 0, 'INDIVIDUAL': 0}
+        self.fallbacks = 0
+        self.failures = 0
+        self.granted = 0
+        self.total_wait = 0.0
+        self.longest_wait = 0.0
+
+    @property
+    def metrics(self) -> dict:
+        """
+        Get a snapshot of the scheduler metrics.
+        """
+        with self._lock:
+            return {
+                "active": dict(self._active),
+                "waiting": {node: len(requests) for node, requests in self._waiting.items()},
+                "started": dict(self.started),
+                "fallbacks": self.fallbacks,
+                "failures": self.failures,
+                "average_wait": self.total_wait / self.granted if self.granted else 0.0,
+                "longest_wait": self.longest_wait,
+            }
+
+    @staticmethod
+    def _node(session) -> str:
+        return session.server.url
+
+    def _waited(self, request: _Request):
+        waited = monotonic() - request.enqueued_at
+        self.granted += 1
+        self.total_wait += waited
+        self.longest_wait = max(self.longest_wait, waited)
+
+    def schedule(self, session, output_mode: str = 'COMPOSED', **kwargs):
+        """
+        Starts a `COMPOSED` recording of a session as soon as its node has capacity.
+
+        :param Session session: The session to record
+        :param str output_mode: `COMPOSED`, or `INDIVIDUAL` to start the recording right away
+        :param kwargs: Further arguments of `Session.start_recording`
+        """
+        node = self._node(session)
+        request = _Request(session, kwargs)
+        if output_mode == 'INDIVIDUAL':
+            self._start_individual(request, fallback=False)
+            return
+        with self._lock:
+            if self._active.get(node, 0) < self.max_composed:
+                self._acquire(node, request)
+                composed = True
+            elif self.max_wait is not None and self.max_wait <= 0:
+                self._waited(request)
+                composed = False
+            else:
+                self._waiting.setdefault(node, deque()).append(request)
+                if self.max_wait is not None:
+                    request.timer = threading.Timer(self.max_wait, self._expire, args=(node, request))
+                    request.timer.daemon = True
+                    request.timer.start()
+                logger.info('Recording of session %s is waiting for node %s', session.id, node)
+                return
+
+        if composed:
+            self._start_composed(node, request)
+        else:
+            self._start_individual(request)
+
+    def _acquire(self, node: str, request: _Request):
+        self._active[node] = self._active.get(node, 0) + 1
+        self._holders[request.session.id] = node
+        self._waited(request)
+
+    def _release(self, session_id: str) -> Optional[_Request]:
+        # frees the slot of a session and hands it to the next waiting request, which is returned
+        node = self._holders.pop(session_id, None)
+        if node is None:
+            return None
+        self._active[node] -= 1
+        waiting = self._waiting.get(node)
+        if not waiting:
+            return None
+        request = waiting.popleft()
+        if request.timer is not None:
+            request.timer.cancel()
+        self._acquire(node, request)
+        return request
+
+    def _expire(self, node: str, request: _Request):
+        with self._lock:
+            waiting = self._waiting.get(node)
+            if not waiting or request not in waiting:
+                return
+            waiting.remove(request)
+            self._waited(request)
+        self._start_individual(request)
+
+    def _start_composed(self, node: str, request: _Request):
+        from . import OpenViduException
+        try:
+            recording = request.session.start_recording(output_mode='COMPOSED', **request.kwargs)
+        except (OpenViduException, requests.RequestException) as e:
+            logger.warning('Could not start COMPOSED recording of session %s: %s', request.session.id, e)
+            with self._lock:
+                following = self._release(request.session.id)
+            if following is not None:
+                self._start_composed(node, following)
+            if self.max_wait is not None and self._overloaded(e):
+                self._start_individual(request)
+            else:
+                self._failed(request, e)
+            return
+        self._started(request, recording)
+
+    @staticmethod
+    def _overloaded(error: Exception) -> bool:
+        # Errors of the request itself, e.g. a closed session, and a disabled recording module are not worth a retry
+        if isinstance(error, requests.RequestException):
+            return True
+        return error.status_code >= 500 and error.status_code != 501
+
+    def _start_individual(self, request: _Request, fallback: bool = True):
+        from . import OpenViduException
+        if fallback:
+            with self._lock:
+                self.fallbacks += 1
+        try:
+            recording = request.session.start_recording(output_mode='INDIVIDUAL', **request.kwargs)
+        except (OpenViduException, requests.RequestException) as e:
+            self._failed(request, e)
+            return
+        self._started(request, recording)
+
+    def _started(self, request: _Request, recording):
+        with self._lock:
+            self.started[recording.output_mode] = self.started.get(recording.output_mode, 0) + 1
+        if self.on_started is not None:
+            self.on_started(request.session, recording)
+
+    def _failed(self, request: _Request, error: Exception):
+        with self._lock:
+            self.failures += 1
+        logger.error('Could not record session %s: %s', request.session.id, error)
+        if self.on_failure is not None:
+            self.on_failure(request.session, error)
+
+    def adopt(self, session, recording):
+        """
+        Accounts for a recording which was started outside of the scheduler, e.g. by a previous instance of the bot.
+
+        :param Session session: The recorded session
+        :param Recording recording: The recording
+        """
+        if recording.output_mode != 'COMPOSED':
+            return
+        node = self._node(session)
+        with self._lock:
+            if session.id not in self._holders:
+                self._active[node] = self._active.get(node, 0) + 1
+                self._holders[session.id] = node
+
+    def cancel(self, session_id: str):
+        """
+        Drops the waiting requests of a session.
+        """
+        with self._lock:
+            for waiting in self._waiting.values():
+                for request in [request for request in waiting if request.session.id == session_id]:
+                    if request.timer is not None:
+                        request.timer.cancel()
+                    waiting.remove(request)
+
+    def release(self, session_id: str):
+        """
+        Frees the capacity used by the recording of a session once it was stopped, and starts the next waiting
+        recording of the node.
+        """
+        with self._lock:
+            node = self._holders.get(session_id)
+            request = self._release(session_id)
+        if request is not None:
+            self._start_composed(node, request)
@@ -0,0 +1,89 @@
+"""
+Coalescing of concurrent identical API calls.
+"""
+
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+
+import requests
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Executes a function at most once at a time per key. Callers arriving while a call for the same key is in flight
+    wait for it and share its result or exception instead of issuing another request. Only use it for idempotent calls.
+
+    Keys are tuples whose first element names the kind of call. Counters are kept per kind.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._executed = {}
+        self._shared = {}
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the number of executed and shared calls per kind of call.
+        """
+        with self._lock:
+            return {kind: {"executed": self._executed.get(kind, 0), "shared": self._shared.get(kind, 0)}
+                    for kind in self._executed.keys() | self._shared.keys()}
+
+    @property
+    def hits(self) -> int:
+        """
+        Get the total number of calls which were served by a call already in flight.
+        """
+        with self._lock:
+            return sum(self._shared.values())
+
+    def do(self, key: Tuple[Hashable, ...], function: Callable, *args, timeout: float = None, **kwargs):
+        """
+        Calls `function(*args, **kwargs)` unless a call for `key` is already in flight, in which case its outcome is
+        returned.
+
+        :param tuple key: Identifies the call, the first element names the kind of call
+        :param function: The function to call
+        :param float timeout: Maximum number of seconds to wait for a call already in flight, or `None` to wait
+            indefinitely. The call itself is not interrupted and still serves the other callers.
+        :return: The result of the function
+        :raises requests.Timeout: If the call in flight did not finish within `timeout`
+        """
+        kind = key[0]
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._shared[kind] = self._shared.get(kind, 0) + 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed[kind] = self._executed.get(kind, 0) + 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise requests.Timeout('Shared call `{}` did not finish within {:.3g} seconds'.format(kind, timeout))
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,129 @@
+"""
+Releasing all resources of sessions on the media server.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import monotonic
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+logger = logging.getLogger('openvidu.teardown')
+
+CLOSE_TIMEOUT = 2
+"""Number of seconds closing a session may take once the deadline has passed."""
+
+
+class TeardownResult:
+    """
+    Outcome of tearing down a single session.
+    """
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.stopped_recordings = []
+        self.unpublished_streams = []
+        self.disconnected_connections = []
+        self.closed = False
+        self.timed_out = False
+        self.errors = []
+
+    def __repr__(self):
+        return str({
+            "session_id": self.session_id,
+            "stopped_recordings": self.stopped_recordings,
+            "unpublished_streams": self.unpublished_streams,
+            "disconnected_connections": self.disconnected_connections,
+            "closed": self.closed,
+            "timed_out": self.timed_out,
+            "errors": [str(error) for error in self.errors],
+        })
+
+
+def teardown_session(session, deadline: float = 10, recordings: Iterable = None) -> TeardownResult:
+    """
+    Stops the active recordings of a session, unpublishes its streams, disconnects its connections and closes it.
+
+    Every step is attempted even if a previous one failed. Each API call is bounded by the time left until `deadline`,
+    so a hanging server cannot block the teardown. Once `deadline` has passed, remaining steps are skipped except
+    closing the session, which gets at least `CLOSE_TIMEOUT` seconds.
+
+    :param Session session: The session to tear down
+    :param float deadline: Number of seconds the teardown may take
+    :param recordings: Recordings of the session to stop. If omitted, the active recordings are queried from the server
+        if the session is being recorded.
+    :return: The outcome of the teardown
+    """
+    from . import OpenViduException, request_deadline
+    errors = (OpenViduException, requests.RequestException)
+
+    expires_at = monotonic() + deadline
+    result = TeardownResult(session.id)
+
+    def attempt(step, *args):
+        if monotonic() > expires_at:
+            result.timed_out = True
+            return False
+        try:
+            step(*args)
+            return True
+        except errors as e:
+            result.errors.append(e)
+            return False
+
+    with request_deadline(deadline):
+        try:
+            session.update()
+        except errors as e:
+            # Session is already gone, there is nothing left to release
+            result.errors.append(e)
+            return result
+
+        if recordings is None:
+            recordings = []
+            if session.recording:
+                attempt(lambda: recordings.extend(session.server.get_recordings(session_id=session.id,
+                                                                                status='started')))
+        for recording in recordings:
+            if attempt(recording.stop_recording):
+                result.stopped_recordings.append(recording.id)
+
+        for connection in session.connections:
+            for publisher in connection.publishers or ():
+                if attempt(session.unpublish, publisher['streamId']):
+                    result.unpublished_streams.append(publisher['streamId'])
+            if attempt(connection.disconnect):
+                result.disconnected_connections.append(connection.id)
+
+    try:
+        with request_deadline(max(expires_at - monotonic(), CLOSE_TIMEOUT)):
+            session.close()
+        result.closed = True
+    except errors as e:
+        result.errors.append(e)
+
+    logger.info('Session `%s` torn down: %s', session.id, result)
+    return result
+
+
+def teardown_sessions(sessions: Iterable, deadline: float = 10, max_workers: int = 16,
+                      recordings: Dict[str, List] = None) -> Dict[str, Optional[TeardownResult]]:
+    """
+    Tears down several sessions in parallel. See `teardown_session`.
+
+    :param sessions: The sessions to tear down
+    :param float deadline: Number of seconds the whole teardown may take
+    :param int max_workers: Maximum number of sessions torn down concurrently
+    :param dict recordings: Recordings to stop per session id
+    :return: The outcome per session id. Sessions which did not finish within the deadline map to `None`.
+    """
+    recordings = recordings or {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(teardown_session, session, deadline, recordings.get(session.id)): session.id
+                   for session in sessions}
+        done, _ = wait(futures, timeout=deadline)
+        return {session_id: future.result() if future in done else None for future, session_id in futures.items()}
+    finally:
+        # Do not block on sessions exceeding the deadline
+        executor.shutdown(wait=False)
@@ -0,0 +1,138 @@
+"""
+Client-side cache for OpenVidu tokens.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Hashable, Optional
+
+
+class TokenCache:
+    """
+    LRU cache of tokens keyed by session id, user and role.
+
+    OpenVidu tokens are single-use: once a client connected with a token, it cannot be used again. A cached token is
+    therefore only handed out again as long as it has not expired, was not invalidated, and was never seen in a
+    connection of the session. Tokens of connections which left before they were seen cannot be detected, so callers
+    must invalidate the token of a user once it may have been used, e.g. when the user leaves the room.
+    """
+    def __init__(self, ttl: float = 300, max_size: int = 1024):
+        """
+        :param float ttl: Number of seconds a cached token is considered valid
+        :param int max_size: Maximum number of cached tokens. The least recently used token is evicted first.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._used = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def logger(self) -> logging.Logger:
+        """
+        Get the logger used by the TokenCache class.
+        """
+        return logging.getLogger('openvidu.TokenCache')
+
+    def get(self, session, user: Hashable, role: str = None, refresh: bool = False, **kwargs):
+        """
+        Returns an unused token for `user` in `session` and generates a new one if necessary.
+
+        :param Session session: The session the token is generated for
+        :param user: Identifier of the user owning the token
+        :param str role: Role granted to the token user
+        :param bool refresh: Update the session before checking whether a cached token was already consumed. This costs
+            about as much as generating a new token. Without refreshing, the last known connections of `session` are
+            used.
+        :param kwargs: Additional parameters passed to `Session.generate_token`. A cached token is only reused if it
+            was generated with the same parameters.
+        :return: The token
+        """
+        key = (session.id, user, role)
+        token = self._lookup(key, kwargs)
+
+        if token is not None:
+            if refresh:
+                session.update()
+            if not self._is_consumed(session, token):
+                self.hits += 1
+                self.logger.debug('Reusing token for user `%s` in session `%s`', user, session.id)
+                return token
+            self.invalidate(session.id, user, role)
+
+        self.misses += 1
+        token = session.generate_token(role=role, **kwargs)
+        self.put(session.id, user, role, token, kwargs)
+        return token
+
+    def put(self, session_id: str, user: Hashable, role: Optional[str], token, options: dict = None):
+        """
+        Stores a token in the cache, unless it is known to be used.
+
+        :param str session_id: The session of the token
+        :param user: Identifier of the user owning the token
+        :param str role: Role granted to the token user
+        :param Token token: The token
+        :param dict options: The additional parameters the token was generated with
+        """
+        key = (session_id, user, role)
+        with self._lock:
+            if token.id in self._used:
+                return
+            self._entries[key] = (token, monotonic() + self.ttl, options or {})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str, user: Hashable = None, role: str = None):
+        """
+        Removes cached tokens, which are never handed out again. If `user` is omitted, all tokens of the session are
+        removed.
+
+        :param str session_id: The session of the tokens
+        :param user: Identifier of the user owning the token
+        :param str role: Role granted to the token user
+        """
+        with self._lock:
+            if user is not None:
+                keys = [(session_id, user, role)] if (session_id, user, role) in self._entries else []
+            else:
+                keys = [key for key in self._entries if key[0] == session_id]
+            for key in keys:
+                self._mark_used(self._entries.pop(key)[0].id)
+
+    def _mark_used(self, token_id: str):
+        self._used[token_id] = None
+        while len(self._used) > self.max_size:
+            self._used.popitem(last=False)
+
+    def _lookup(self, key, options: dict):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at, cached_options = entry
+            if cached_options != options:
+                return None
+            if expires_at <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def _is_consumed(self, session, token) -> bool:
+        with self._lock:
+            if token.id in self._used:
+                return True
+        if any(connection.get('token') == token.id for connection in session._data['connections']['content']):
+            with self._lock:
+                self._mark_used(token.id)
+            return True
+        return False
@@ -1,39 +1,105 @@
 var OV;
 var session;
 
-var TRIES = 20;
 var TOKEN = null;
 
-var REFRESH_INTERVAL = null;
+// openvidu-browser is served from this repository, next to this script, under a stable URL which browsers cache. Run
+// `scripts/fetch-openvidu-browser.sh` to add it. Until it is added, the GitHub release asset is used, which redirects
+// to a new signed URL on every request and is downloaded on every page load.
+var OPENVIDU_BROWSER_URL =
+    'https://raw.githubusercontent.com/clp-research/slurk-audio-pilot/master/scripts/openvidu-browser-2.11.0.min.js';
+var OPENVIDU_BROWSER_RELEASE_URL =
+    'https://github.com/OpenVidu/openvidu/releases/download/v2.11.0/openvidu-browser-2.11.0.min.js';
 
-$.getScript('https://github.com/OpenVidu/openvidu/releases/download/v2.11.0/openvidu-browser-2.11.0.min.js', function () {
+function loadOpenViduBrowser() {
+    if (typeof OpenVidu !== 'undefined') {
+        return $.Deferred().resolve().promise();
+    }
+    // Requested with XHR instead of a script tag, as raw.githubusercontent.com serves scripts as text/plain, which
+    // browsers refuse to execute from a script tag
+    var local = $.ajax({url: OPENVIDU_BROWSER_URL, dataType: 'script', cache: true, crossDomain: false});
+    return local.then(null, function () {
+        console.warn('openvidu-browser is missing next to document.ready.js, loading the release asset');
+        return $.ajax({url: OPENVIDU_BROWSER_RELEASE_URL, dataType: 'script', cache: true}).fail(function () {
+            console.error('Could not load openvidu-browser');
+        });
+    });
+}
+
+// Media published by this client, configured by the `openvidu-media` field of the layout: "audio" publishes and
+// subscribes to audio only, anything else uses audio and video.
+var mediaField = document.getElementById("openvidu-media");
+var AUDIO_ONLY = mediaField !== null && mediaField.value === "audio";
+
+// Mono voice capture with the browser's processing enabled and the smallest capture latency the device supports
+var AUDIO_CONSTRAINTS = {
+    channelCount: 1,
+    echoCancellation: true,
+    noiseSuppression: true,
+    autoGainControl: true,
+    latency: 0
+};
+
+function onToken(token) {
+    if (!token || TOKEN) {
+        return;
+    }
+    TOKEN = token;
+    openviduReady.then(function () {
+        initVideo(token);
+    });
+}
+
+var openviduReady = loadOpenViduBrowser().then(function () {
     OV = new OpenVidu();
     session = OV.initSession();
 
 	session.on("streamCreated", function (event) {
-		session.subscribe(event.stream, "subscribers");
+		session.subscribe(event.stream, "subscribers", {
+			subscribeToAudio: true,
+			subscribeToVideo: !AUDIO_ONLY
+		});
 	});
+});
 
-    REFRESH_INTERVAL = setInterval(() => {
-        const token = document.getElementById("openvidu-token").value;
-        console.log("Waiting for openvidu token...");
-        if (token) {
-            clearInterval(REFRESH_INTERVAL);
-            initVideo(token);
-            console.log(token);
-        }
-    }, 500);
+// The bot delivers the token with `set_attribute`, which is forwarded to the client as `attribute_update`
+socket.on("attribute_update", (data) => {
+    if (data.id === "openvidu-token" && data.attribute === "value") {
+        onToken(data.value);
+    }
 });
 
+// Fall back to observing the hidden field in case the token was set before this script was loaded
+var tokenField = document.getElementById("openvidu-token");
+onToken(tokenField.value);
+new MutationObserver(function (mutations, observer) {
+    if (TOKEN) {
+        observer.disconnect();
+        return;
+    }
+    onToken(tokenField.value || tokenField.getAttribute("value"));
+}).observe(tokenField, {attributes: true, attributeFilter: ["value"]});
+
 async function initVideo(token) {
     console.log("Initializing openvidu...");
 
     await session.connect(token);
 
-    const publisher = OV.initPublisher("publisher");
+    let publisher;
+    if (AUDIO_ONLY) {
+        const stream = await navigator.mediaDevices.getUserMedia({audio: AUDIO_CONSTRAINTS, video: false});
+        publisher = OV.initPublisher("publisher", {
+            audioSource: stream.getAudioTracks()[0],
+            videoSource: false,
+            publishAudio: true,
+            publishVideo: false
+        });
+    } else {
+        publisher = OV.initPublisher("publisher");
+    }
     session.publish(publisher);
 }
 
 socket.on("command", (data) => {
     console.log(data)
-});
\ No newline at end of file
+});
@@ -0,0 +1,11 @@
+#!/usr/bin/env bash
+
+# Downloads the openvidu-browser release matching the OpenVidu server into this directory, from where the pilot layout
+# loads it next to document.ready.js. Commit the downloaded file.
+
+set -eu
+
+VERSION=${1:-2.11.0}
+cd "$(dirname "$0")"
+curl -fL -o "openvidu-browser-${VERSION}.min.js" \
+    "https://github.com/OpenVidu/openvidu/releases/download/v${VERSION}/openvidu-browser-${VERSION}.min.js"
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+from openvidu.cdr import CdrIngestor, CdrSummary
+
+
+def event(name, **properties):
+    return name, dict(properties, sessionId='room', timestamp=0)
+
+
+class CdrSummaryTest(unittest.TestCase):
+    def test_aggregates_per_room(self):
+        summary = CdrSummary()
+        summary.update([
+            event('sessionCreated'),
+            event('participantJoined'),
+            event('participantLeft', duration=120, reason='disconnect'),
+            event('recordingStarted'),
+            event('recordingStopped', duration=30, reason='recordingStoppedByServer'),
+            event('sessionDestroyed', duration=200, reason='lastParticipantLeft'),
+            ('sessionCreated', {'sessionId': 'other'}),
+        ])
+        self.assertEqual(summary.rooms, ['room', 'other'])
+        row = summary.row('room')
+        self.assertEqual((row['sessions'], row['participants'], row['recordings']), (1, 1, 1))
+        self.assertEqual((row['session_seconds'], row['participant_minutes'], row['recording_seconds']),
+                         (200, 2, 30))
+        self.assertEqual((row['participant_failures'], row['recording_failures']), (0, 0))
+        self.assertEqual(summary.totals()['sessions'], 2)
+
+    def test_incident_is_counted_once_per_participant_and_recording(self):
+        summary = CdrSummary()
+        reason = 'mediaServerDisconnect'
+        # A media server crash ends every stream, both participants, the recording and the session
+        summary.update([
+            event('webrtcConnectionDestroyed', participant='a', reason=reason),
+            event('webrtcConnectionDestroyed', participant='a', reason=reason),
+            event('webrtcConnectionDestroyed', participant='b', reason=reason),
+            event('webrtcConnectionDestroyed', participant='b', reason=reason),
+            event('participantLeft', participant='a', duration=60, reason=reason),
+            event('participantLeft', participant='b', duration=60, reason=reason),
+            event('recordingStopped', duration=60, reason=reason),
+            event('sessionDestroyed', duration=60, reason=reason),
+        ])
+        row = summary.row('room')
+        self.assertEqual(row['participant_failures'], 2)
+        self.assertEqual(row['recording_failures'], 1)
+
+    def test_round_trip(self):
+        summary = CdrSummary()
+        summary.add(*event('participantLeft', duration=60, reason='networkDisconnect'))
+        restored = CdrSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+        self.assertEqual(restored.row('room'), summary.row('room'))
+
+
+class CdrIngestorTest(unittest.TestCase):
+    def test_resumes_without_counting_twice(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'cdr')
+        state = os.path.join(directory.name, 'state.json')
+
+        with open(path, 'w') as file:
+            file.write(json.dumps({'sessionCreated': {'sessionId': 'room'}}) + '\n')
+            file.write(json.dumps({'participantJoined': {'sessionId': 'room'}}))
+        self.assertEqual(CdrIngestor(path, state).poll(), 1)
+
+        with open(path, 'a') as file:
+            file.write('\n')
+        ingestor = CdrIngestor(path, state)
+        self.assertEqual(ingestor.poll(), 1)
+        self.assertEqual(ingestor.summary.row('room')['sessions'], 1)
+        self.assertEqual(ingestor.summary.row('room')['participants'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import threading
+import unittest
+
+from bot.dispatch import EventQueue, EventDispatcher, LANE_ROOM, LANE_JOIN, LANE_LEAVE
+
+
+def handler(data):
+    pass
+
+
+class EventQueueTest(unittest.TestCase):
+    def drain(self, queue):
+        events = []
+        while True:
+            event = queue.get(timeout=0)
+            if event is None:
+                return events
+            events.append(event)
+            queue.done(event)
+
+    def test_rooms_are_served_by_lane(self):
+        queue = EventQueue()
+        queue.put('a', LANE_LEAVE, handler, 'leave a', 'alice')
+        queue.put('b', LANE_JOIN, handler, 'join b', 'bob')
+        queue.put('c', LANE_ROOM, handler, 'room c')
+        self.assertEqual([event.data for event in self.drain(queue)], ['room c', 'join b', 'leave a'])
+
+    def test_room_is_not_served_while_busy(self):
+        queue = EventQueue()
+        queue.put('a', LANE_JOIN, handler, 'first', 'alice')
+        queue.put('a', LANE_JOIN, handler, 'second', 'bob')
+        first = queue.get(timeout=0)
+        self.assertIsNone(queue.get(timeout=0))
+        queue.done(first)
+        self.assertEqual(queue.get(timeout=0).data, 'second')
+
+    def test_leave_drops_waiting_join(self):
+        queue = EventQueue()
+        queue.put('a', LANE_JOIN, handler, 'join', 'alice')
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'alice')
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.metrics['coalesced'], 1)
+
+    def test_leave_is_kept_after_handled_join(self):
+        queue = EventQueue()
+        queue.put('a', LANE_JOIN, handler, 'join', 'alice')
+        queue.done(queue.get(timeout=0))
+        queue.put('a', LANE_JOIN, handler, 'rejoin', 'alice')
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'alice')
+        self.assertEqual([event.data for event in self.drain(queue)], ['leave'])
+        self.assertEqual(queue.metrics['coalesced'], 1)
+
+    def test_leave_is_kept_while_join_is_handled(self):
+        queue = EventQueue()
+        queue.put('a', LANE_JOIN, handler, 'join', 'alice')
+        join = queue.get(timeout=0)
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'alice')
+        queue.done(join)
+        self.assertEqual([event.data for event in self.drain(queue)], ['leave'])
+
+    def test_join_after_handled_leave_is_dropped(self):
+        queue = EventQueue()
+        queue.put('a', LANE_JOIN, handler, 'join', 'alice')
+        queue.done(queue.get(timeout=0))
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'alice')
+        queue.done(queue.get(timeout=0))
+        queue.put('a', LANE_JOIN, handler, 'rejoin', 'alice')
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'alice')
+        self.assertEqual(self.drain(queue), [])
+
+    def test_leave_of_other_user_is_kept(self):
+        queue = EventQueue()
+        queue.put('a', LANE_JOIN, handler, 'join', 'alice')
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'bob')
+        self.assertEqual([event.data for event in self.drain(queue)], ['join', 'leave'])
+
+    def test_full_queue_blocks_until_served(self):
+        queue = EventQueue(maxsize=1)
+        queue.put('a', LANE_JOIN, handler, 'first', 'alice')
+        enqueued = threading.Event()
+
+        def put():
+            queue.put('b', LANE_JOIN, handler, 'second', 'bob')
+            enqueued.set()
+
+        with self.assertLogs('bot.EventQueue', 'WARNING'):
+            thread = threading.Thread(target=put)
+            thread.start()
+            self.assertFalse(enqueued.wait(0.1))
+        queue.done(queue.get(timeout=0))
+        self.assertTrue(enqueued.wait(1))
+        thread.join()
+        self.assertEqual(queue.metrics['blocked_puts'], 1)
+
+    def test_full_queue_does_not_block_coalesced_leave(self):
+        queue = EventQueue(maxsize=1)
+        queue.put('a', LANE_JOIN, handler, 'join', 'alice')
+        queue.put('a', LANE_LEAVE, handler, 'leave', 'alice')
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.metrics['blocked_puts'], 0)
+
+
+class EventDispatcherTest(unittest.TestCase):
+    def test_handles_events_despite_errors(self):
+        queue = EventQueue()
+        handled = []
+        finished = threading.Event()
+
+        def fail(data):
+            raise RuntimeError(data)
+
+        def record(data):
+            handled.append(data)
+            finished.set()
+
+        dispatcher = EventDispatcher(queue, workers=2)
+        dispatcher.start()
+        try:
+            with self.assertLogs('bot.EventDispatcher', 'ERROR'):
+                queue.put('a', LANE_ROOM, fail, 'room')
+                queue.put('a', LANE_JOIN, record, 'join', 'alice')
+                self.assertTrue(finished.wait(1))
+        finally:
+            dispatcher.stop()
+        self.assertEqual(handled, ['join'])
@@ -0,0 +1,67 @@
+import unittest
+
+from bot.health import RingBuffer, RoomHealth, HealthSampler
+from openvidu import SessionSummary
+
+
+def session_data(session_id, connections):
+    return {
+        "sessionId": session_id,
+        "createdAt": 0,
+        "recording": False,
+        "connections": {
+            "numberOfElements": len(connections),
+            "content": [{"connectionId": connection_id, "publishers": [{}] * published,
+                         "subscribers": [{}] * subscribed}
+                        for connection_id, (published, subscribed) in connections.items()],
+        },
+    }
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_overwrites_oldest(self):
+        buffer = RingBuffer(3, 'l')
+        for value in range(5):
+            buffer.append(value)
+        self.assertEqual(buffer.values(), [2, 3, 4])
+        self.assertEqual(buffer.last(), 4)
+        self.assertEqual(buffer.percentile(50), 3)
+
+
+class RoomHealthTest(unittest.TestCase):
+    def test_silence_is_tracked_per_connection(self):
+        health = RoomHealth('room', 10)
+        health.record(0, 2, 1, 1, False, {'con_a': (0, 1), 'con_b': (1, 0)})
+        health.record(20, 2, 0, 1, False, {'con_a': (0, 1), 'con_b': (0, 0)})
+        self.assertEqual(health.anomalies(40, 30), ['connection con_a not publishing for 40 seconds'])
+        self.assertEqual(health.anomalies(60, 30), ['connection con_a not publishing for 60 seconds',
+                                                    'connection con_b not publishing for 40 seconds'])
+
+        # Publishing again or leaving ends the silence, a connection silent again starts over
+        health.record(70, 1, 1, 0, False, {'con_b': (1, 0)})
+        self.assertEqual(health.silent_since, {})
+        health.record(80, 1, 0, 0, False, {'con_b': (0, 0)})
+        self.assertEqual(health.anomalies(100, 30), [])
+        self.assertEqual(health.summary()['connection_streams'], {'con_b': {'publishers': 0, 'subscribers': 0}})
+
+
+class HealthSamplerTest(unittest.TestCase):
+    def test_reports_silent_connection_by_id(self):
+        class FakeServer:
+            def iter_sessions(self, prefix=None, summary=False):
+                yield SessionSummary(session_data('room', {'con_a': (1, 1), 'con_b': (0, 1)}))
+                yield SessionSummary(session_data('other', {'con_c': (0, 0)}))
+
+        reported = {}
+        sampler = HealthSampler(FakeServer(), lambda: ['room'], publisher_timeout=-1,
+                                on_anomaly=lambda session_id, anomalies: reported.update({session_id: anomalies}))
+        sampler.sample()
+        self.assertEqual(list(sampler.health), ['room'])
+        self.assertEqual(sampler.health['room'].connection_streams, {'con_a': (1, 1), 'con_b': (0, 1)})
+        self.assertEqual(list(reported), ['room'])
+        self.assertEqual(len(reported['room']), 1)
+        self.assertTrue(reported['room'][0].startswith('connection con_b not publishing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
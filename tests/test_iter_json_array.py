@@ -0,0 +1,71 @@
+import json
+import random
+import unittest
+
+from openvidu import _iter_json_array
+
+
+def split(body: bytes, cuts):
+    cuts = sorted(cuts)
+    return [body[start:end] for start, end in zip([0] + cuts, cuts + [len(body)])]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    elements = [
+        {"sessionId": "room-1", "connections": {"numberOfElements": 0, "content": []}},
+        {"sessionId": "brackets", "data": "]}[{,", "nested": [[1, [2]], {"a": {"b": "}"}}]},
+        {"sessionId": "quotes", "data": "say \"]\" and \\", "unicode": "äöü €𝄞"},
+        12345,
+        -1.5e3,
+        "scalar ] string",
+        True,
+        None,
+        [],
+        {},
+    ]
+
+    def body(self, elements=None) -> bytes:
+        return json.dumps({
+            "numberOfElements": 3,
+            "skipped": {"content": "not this one", "list": [1, 2]},
+            "content": self.elements if elements is None else elements,
+        }).encode('utf-8')
+
+    def test_single_chunk(self):
+        self.assertEqual(list(_iter_json_array([self.body()], 'content')), self.elements)
+
+    def test_one_byte_chunks(self):
+        body = self.body()
+        chunks = [body[i:i + 1] for i in range(len(body))]
+        self.assertEqual(list(_iter_json_array(chunks, 'content')), self.elements)
+
+    def test_random_chunks(self):
+        body = self.body()
+        generator = random.Random(0)
+        for _ in range(200):
+            cuts = generator.sample(range(1, len(body)), generator.randint(1, 40))
+            self.assertEqual(list(_iter_json_array(split(body, cuts), 'content')), self.elements)
+
+    def test_scalar_split_at_chunk_boundary(self):
+        body = b'{"content": [1'
+        self.assertEqual(list(_iter_json_array([body, b'2, 3]}'], 'content')), [12, 3])
+        self.assertEqual(list(_iter_json_array([b'{"content": [tr', b'ue, nul', b'l]}'], 'content')), [True, None])
+        self.assertEqual(list(_iter_json_array([b'{"content": [-1.', b'5e', b'3]}'], 'content')), [-1500.0])
+
+    def test_element_larger_than_chunks(self):
+        element = {"sessionId": "large", "data": ["x" * 100] * 2000}
+        body = self.body([element, 1])
+        chunks = [body[i:i + 64] for i in range(0, len(body), 64)]
+        self.assertEqual(list(_iter_json_array(chunks, 'content')), [element, 1])
+
+    def test_missing_key(self):
+        self.assertEqual(list(_iter_json_array([b'{"other": [1, 2]}'], 'content')), [])
+
+    def test_empty_array(self):
+        self.assertEqual(list(_iter_json_array([b'{"content": [', b' ]}'], 'content')), [])
+
+    def test_truncated_body(self):
+        with self.assertRaises(ValueError):
+            list(_iter_json_array([b'{"content": [{"a": 1}, {"b": '], 'content'))
+        with self.assertRaises(ValueError):
+            list(_iter_json_array([b'{"content": [1, 2'], 'content'))
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from bot.lease import Lease, LeaderElector
+
+
+class LeaseTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'lease.db')
+
+    def test_single_holder(self):
+        first = Lease(self.path, holder='first', ttl=10)
+        second = Lease(self.path, holder='second', ttl=10)
+        self.assertEqual(first.acquire(), 1)
+        self.assertIsNone(second.acquire())
+        # Renewing keeps the term
+        self.assertEqual(first.acquire(), 1)
+
+    def test_takeover_after_expiry_increments_term(self):
+        first = Lease(self.path, holder='first', ttl=0.1)
+        second = Lease(self.path, holder='second', ttl=0.1)
+        self.assertEqual(first.acquire(), 1)
+        time.sleep(0.15)
+        self.assertEqual(second.acquire(), 2)
+        self.assertIsNone(first.acquire())
+
+    def test_release_allows_takeover_and_keeps_term(self):
+        first = Lease(self.path, holder='first', ttl=10)
+        second = Lease(self.path, holder='second', ttl=10)
+        self.assertEqual(first.acquire(), 1)
+        second.release()
+        self.assertIsNone(second.acquire())
+        first.release()
+        self.assertEqual(second.acquire(), 2)
+
+    def test_leases_are_independent_by_name(self):
+        first = Lease(self.path, name='a', holder='first', ttl=10)
+        second = Lease(self.path, name='b', holder='second', ttl=10)
+        self.assertEqual(first.acquire(), 1)
+        self.assertEqual(second.acquire(), 1)
+
+
+class LeaderElectorTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'lease.db')
+
+    def test_standby_takes_over_after_stop(self):
+        elected = {}
+        events = {name: threading.Event() for name in ('first', 'second')}
+
+        def on_elected(name):
+            def callback(term):
+                elected[name] = term
+                events[name].set()
+            return callback
+
+        first = LeaderElector(Lease(self.path, holder='first', ttl=0.3), on_elected=on_elected('first'))
+        second = LeaderElector(Lease(self.path, holder='second', ttl=0.3), on_elected=on_elected('second'))
+        first.start()
+        self.assertTrue(events['first'].wait(1))
+        second.start()
+        try:
+            self.assertFalse(events['second'].wait(0.3))
+            self.assertTrue(first.is_leader)
+            self.assertFalse(second.is_leader)
+
+            first.stop()
+            self.assertFalse(first.is_leader)
+            self.assertTrue(events['second'].wait(1))
+            self.assertTrue(second.is_leader)
+        finally:
+            second.stop()
+        self.assertEqual(elected, {'first': 1, 'second': 2})
+
+    def test_leader_is_demoted_when_lease_is_taken(self):
+        demoted = threading.Event()
+        elector = LeaderElector(Lease(self.path, holder='first', ttl=0.3), interval=0.05, on_demoted=demoted.set)
+        elector.start()
+        try:
+            deadline = time.monotonic() + 1
+            while not elector.is_leader and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(elector.is_leader)
+
+            # Another holder took over, e.g. after this instance was paused for longer than the ttl
+            with self.assertLogs('bot.LeaderElector', 'WARNING'):
+                connection = sqlite3.connect(self.path, isolation_level=None)
+                connection.execute("UPDATE lease SET holder = 'second', term = term + 1, expires_at = ?",
+                                   (time.time() + 10,))
+                connection.close()
+                self.assertTrue(demoted.wait(1))
+            self.assertFalse(elector.is_leader)
+        finally:
+            elector.stop()
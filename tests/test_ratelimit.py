@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+
+import requests
+
+from openvidu.ratelimit import AdmissionController, TokenBucket, PRIORITY_TOKEN, PRIORITY_HOUSEKEEPING
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_delay(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        for _ in range(2):
+            self.assertEqual(bucket.delay(), 0)
+            bucket.take()
+        self.assertGreater(bucket.delay(), 0)
+        self.assertLessEqual(bucket.delay(), 0.1)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_disabled_without_limits(self):
+        admission = AdmissionController()
+        self.assertFalse(admission.enabled)
+        with admission.admit('sessions'):
+            self.assertEqual(admission.in_flight, {})
+
+    def test_concurrency_limit_per_endpoint(self):
+        admission = AdmissionController(concurrency={'sessions': 1})
+        admission.acquire('sessions')
+        admitted = threading.Event()
+
+        def second():
+            with admission.admit('sessions'):
+                admitted.set()
+
+        thread = threading.Thread(target=second)
+        thread.start()
+        # Other endpoints are not blocked by the waiting call
+        with admission.admit('tokens'):
+            pass
+        self.assertFalse(admitted.wait(0.1))
+        self.assertEqual(admission.in_flight, {'sessions': 1})
+
+        admission.release('sessions')
+        self.assertTrue(admitted.wait(1))
+        thread.join()
+        self.assertEqual(admission.in_flight, {})
+
+    def test_waiting_calls_are_admitted_by_priority(self):
+        admission = AdmissionController(concurrency={'sessions': 1})
+        admission.acquire('sessions')
+        order = []
+
+        def call(priority, name):
+            with admission.admit('sessions', priority):
+                order.append(name)
+
+        threads = [threading.Thread(target=call, args=(PRIORITY_HOUSEKEEPING, 'housekeeping'))]
+        threads[0].start()
+        while admission.queue_depth.get(PRIORITY_HOUSEKEEPING) != 1:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=call, args=(PRIORITY_TOKEN, 'token')))
+        threads[1].start()
+        while admission.queue_depth.get(PRIORITY_TOKEN) != 1:
+            time.sleep(0.001)
+
+        admission.release('sessions')
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['token', 'housekeeping'])
+        self.assertEqual(admission.admitted, 3)
+
+    def test_rate_limit(self):
+        admission = AdmissionController(rate=20, burst=1)
+        started_at = time.monotonic()
+        for _ in range(3):
+            with admission.admit('tokens'):
+                pass
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.09)
+
+    def test_timeout_while_waiting(self):
+        admission = AdmissionController(concurrency={'sessions': 1})
+        admission.acquire('sessions')
+        started_at = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            admission.acquire('sessions', timeout=0.05)
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        # The timed out call no longer waits and does not hold up the next one
+        self.assertEqual(admission.queue_depth, {})
+        admission.release('sessions')
+        with admission.admit('sessions', timeout=0.05):
+            self.assertEqual(admission.in_flight, {'sessions': 1})
+
+    def test_timeout_while_rate_limited(self):
+        admission = AdmissionController(rate=1, burst=1)
+        with admission.admit('tokens'):
+            pass
+        with self.assertRaises(requests.Timeout):
+            admission.acquire('tokens', timeout=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
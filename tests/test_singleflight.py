@@ -0,0 +1,57 @@
+import threading
+import unittest
+
+import requests
+
+from openvidu.singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_the_result(self):
+        flight = SingleFlight()
+        started, finish = threading.Event(), threading.Event()
+        results = []
+
+        def fetch():
+            started.set()
+            finish.wait(1)
+            return 'data'
+
+        thread = threading.Thread(target=lambda: results.append(flight.do(('session', 'a'), fetch)))
+        thread.start()
+        self.assertTrue(started.wait(1))
+        follower = threading.Thread(target=lambda: results.append(flight.do(('session', 'a'), fetch)))
+        follower.start()
+        while not flight.hits:
+            follower.join(0.001)
+        finish.set()
+        thread.join()
+        follower.join()
+        self.assertEqual(results, ['data', 'data'])
+        self.assertEqual(flight.stats, {'session': {'executed': 1, 'shared': 1}})
+
+    def test_waiting_caller_times_out(self):
+        flight = SingleFlight()
+        started, finish = threading.Event(), threading.Event()
+        results = []
+
+        def fetch():
+            started.set()
+            finish.wait(1)
+            return 'data'
+
+        thread = threading.Thread(target=lambda: results.append(flight.do(('session', 'a'), fetch)))
+        thread.start()
+        try:
+            self.assertTrue(started.wait(1))
+            with self.assertRaises(requests.Timeout):
+                flight.do(('session', 'a'), fetch, timeout=0.05)
+        finally:
+            finish.set()
+            thread.join()
+        # The call in flight is not interrupted by the caller giving up
+        self.assertEqual(results, ['data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from itertools import count
+
+from openvidu import Token
+from openvidu.tokens import TokenCache
+
+
+class FakeSession:
+    def __init__(self, id='session'):
+        self.id = id
+        self.connections = []
+        self.updates = 0
+        self._ids = count(1)
+        self._data = {'connections': {'content': self.connections}}
+
+    def generate_token(self, role=None, **kwargs):
+        return Token({'id': 'tok{}'.format(next(self._ids)), 'session': self.id, 'role': role, 'data': None})
+
+    def update(self):
+        self.updates += 1
+
+    def connect(self, token):
+        self.connections.append({'token': token.id})
+
+    def disconnect(self, token):
+        self.connections.remove({'token': token.id})
+
+
+class TokenCacheTest(unittest.TestCase):
+    def test_unused_token_is_reused(self):
+        cache = TokenCache()
+        session = FakeSession()
+        first = cache.get(session, 1)
+        self.assertIs(cache.get(session, 1), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_does_not_refresh_by_default(self):
+        cache = TokenCache()
+        session = FakeSession()
+        cache.get(session, 1)
+        cache.get(session, 1)
+        self.assertEqual(session.updates, 0)
+        cache.get(session, 1, refresh=True)
+        self.assertEqual(session.updates, 1)
+
+    def test_connected_token_is_not_reused(self):
+        cache = TokenCache()
+        session = FakeSession()
+        first = cache.get(session, 1)
+        session.connect(first)
+        self.assertNotEqual(cache.get(session, 1).id, first.id)
+
+    def test_token_seen_in_a_connection_stays_used_after_disconnect(self):
+        cache = TokenCache()
+        session = FakeSession()
+        first = cache.get(session, 1)
+        session.connect(first)
+        second = cache.get(session, 1)
+        session.disconnect(first)
+        cache.put(session.id, 2, None, first)
+        self.assertIs(cache.get(session, 1), second)
+        self.assertNotEqual(cache.get(session, 2).id, first.id)
+
+    def test_invalidated_token_is_not_reused_after_reconnect(self):
+        cache = TokenCache()
+        session = FakeSession()
+        first = cache.get(session, 1)
+        session.connect(first)
+        session.disconnect(first)
+        cache.invalidate(session.id, 1)
+        self.assertNotEqual(cache.get(session, 1).id, first.id)
+
+    def test_token_with_other_options_is_not_reused(self):
+        cache = TokenCache()
+        session = FakeSession()
+        first = cache.get(session, 1, video_max_recv_bandwidth=30)
+        second = cache.get(session, 1, video_max_recv_bandwidth=10)
+        self.assertNotEqual(second.id, first.id)
+        self.assertIs(cache.get(session, 1, video_max_recv_bandwidth=10), second)
+
+    def test_users_and_roles_have_separate_tokens(self):
+        cache = TokenCache()
+        session = FakeSession()
+        tokens = {cache.get(session, 1).id, cache.get(session, 2).id, cache.get(session, 1, role='MODERATOR').id}
+        self.assertEqual(len(tokens), 3)
+
+    def test_expired_token_is_replaced(self):
+        cache = TokenCache(ttl=0)
+        session = FakeSession()
+        first = cache.get(session, 1)
+        self.assertNotEqual(cache.get(session, 1).id, first.id)
+
+    def test_least_recently_used_token_is_evicted(self):
+        cache = TokenCache(max_size=2)
+        session = FakeSession()
+        first = cache.get(session, 1)
+        cache.get(session, 2)
+        cache.get(session, 1)
+        cache.get(session, 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(session, 1), first)
+        self.assertEqual(cache.misses, 3)
+        self.assertNotIn((session.id, 2, None), cache._entries)
+
+    def test_invalidate_session(self):
+        cache = TokenCache()
+        session = FakeSession()
+        cache.get(session, 1)
+        cache.get(session, 2)
+        cache.get(FakeSession('other'), 1)
+        cache.invalidate(session.id)
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()